@@ -0,0 +1,182 @@
+import threading
+import warnings
+from collections import OrderedDict
+from datetime import timedelta
+from functools import lru_cache
+
+import numpy as np
+
+import metrics
+
+# --- KPI-ДВИГУН ---
+# Усі показники для таблиць дашборду та API рахуються тут, за один прохід NumPy по кожному
+# набору даних, і запам'ятовуються за версією даних: повторний рендер Streamlit або
+# запит до API з тими самими даними нічого не перераховує.
+
+GREEN_MARKERS = ('Вітер', 'Сонце', 'ГЕС', 'Біо')
+MIX_MARKERS = {'solar': 'Сонце', 'wind': 'Вітер', 'hydro': 'ГЕС'}
+MEMO_SIZE = 512
+TREND_HOURS = 4
+
+
+@lru_cache(maxsize=256)
+def green_columns(columns):
+    """Позиції "зелених" колонок генерації та окремо сонця/вітру/гідро (кеш за набором назв колонок)."""
+    green = np.array([i for i, c in enumerate(columns) if any(x in c for x in GREEN_MARKERS)], dtype=int)
+    mix = {k: np.array([i for i, c in enumerate(columns) if m in c], dtype=int) for k, m in MIX_MARKERS.items()}
+    return green, mix
+
+
+def _values(data):
+    # 2D float-масив (рядки × колонки) для Series і DataFrame
+    return data.to_numpy(dtype=float).reshape(len(data), data.shape[1] if data.ndim == 2 else 1)
+
+
+def _present(data, key):
+    # Порожній зріз (напр. небаланси сьогодні до першого опублікованого інтервалу) — як відсутні дані
+    value = data.get(key)
+    return None if value is None or value.empty else value
+
+
+def _first(stats):
+    # Як safe_float: перше не-NaN значення по колонках, інакше 0
+    stats = stats[~np.isnan(stats)]
+    return float(stats[0]) if len(stats) else 0.0
+
+
+def _col_stats(values):
+    if values.size == 0:
+        return 0.0, 0.0, 0.0
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return _first(np.nanmin(values, axis=0)), _first(np.nanmax(values, axis=0)), _first(np.nanmean(values, axis=0))
+
+
+def _ffill(values):
+    # Векторний forward-fill по рядках (аналог DataFrame.ffill)
+    mask = np.isnan(values)
+    idx = np.where(~mask, np.arange(len(values))[:, None], 0)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    return values[idx, np.arange(values.shape[1])]
+
+
+def period_kpis(data):
+    """Показники за період: ціни РДН, обсяг і оборот ринку, ВДЕ, небаланси.
+
+    data: {'prices', 'load', 'imb_p', 'imb_v', 'gen'} -> Series/DataFrame або None.
+    Відсутні набори дають None у відповідному розділі (для небалансів — нулі, як у таблиці).
+    """
+    kpis = {'price': None, 'market': None, 'res': None}
+    prices, load, gen = _present(data, 'prices'), _present(data, 'load'), _present(data, 'gen')
+
+    p_raw = _values(prices) if prices is not None else None
+    if p_raw is not None:
+        p = _ffill(p_raw)
+        mn, mx, avg = _col_stats(p)
+        _, raw_max, raw_avg = _col_stats(p_raw)
+        kpis['price'] = {'min': mn, 'max': mx, 'avg': avg, 'raw_max': raw_max, 'raw_avg': raw_avg}
+
+        volume = turnover = 0.0
+        if load is not None:
+            l = _values(load)[:, 0]
+            volume = float(np.nansum(l)) / 1000
+            _, ip, il = np.intersect1d(prices.index.asi8, load.index.asi8, assume_unique=True, return_indices=True)
+            prod = p[ip, 0] * l[il]
+            turnover = float(np.sum(prod[~np.isnan(prod)])) / 1000000
+        kpis['market'] = {'volume_gwh': volume, 'turnover_meur': turnover}
+
+    if gen is not None:
+        g = np.nan_to_num(_values(gen))
+        green, mix = green_columns(tuple(gen.columns))
+        col_sums = g.sum(axis=0)
+        total_mw = float(col_sums.sum())
+        green_mw = float(col_sums[green].sum())
+        avg_p = kpis['price']['raw_avg'] if kpis['price'] else 0.0
+        kpis['res'] = {
+            'share_pct': green_mw / total_mw * 100 if total_mw > 0 else 0.0,
+            'green_gwh': green_mw / 1000,
+            'value_meur': green_mw * avg_p / 1000000,
+            **{f'{k}_pct': (float(col_sums[cols].sum()) / green_mw * 100 if green_mw else 0.0) for k, cols in mix.items()},
+        }
+
+    imb_p, imb_v = _present(data, 'imb_p'), _present(data, 'imb_v')
+    p_min, p_max, p_avg = _col_stats(_values(imb_p)) if imb_p is not None else (0.0, 0.0, 0.0)
+    v_min, v_max, _ = _col_stats(_values(imb_v)) if imb_v is not None else (0.0, 0.0, 0.0)
+    kpis['imbalance'] = {'price_max': p_max, 'price_min': p_min, 'price_avg': p_avg,
+                         'surplus_max_mw': v_max, 'deficit_max_mw': v_min}
+    return kpis
+
+
+def trend(series, now, hours=TREND_HOURS):
+    """Зміна за останні `hours` годин до now (як asof): {diff, pct} або None, якщо ряду немає.
+
+    Ряд цін містить і завтрашній РДН, тож тренд рахується від поточного моменту, а не від кінця ряду.
+    """
+    if series is None or series.empty:
+        return None
+    values = _ffill(_values(series))
+    pos = series.index.searchsorted([now - timedelta(hours=hours), now], side='right') - 1
+    now_v = _first(values[pos[1]]) if pos[1] >= 0 else 0.0
+    past_v = _first(values[pos[0]]) if pos[0] >= 0 else 0.0
+    diff = now_v - past_v
+    return {'diff': diff, 'pct': diff / past_v * 100 if past_v != 0 else 0.0}
+
+
+def live_kpis(live, now):
+    """Поточні показники: спот-ціна, частка ВДЕ зараз, тренди за 4 год, спред небалансу за сьогодні."""
+    prices, gen, imb_p = _present(live, 'prices'), _present(live, 'gen'), _present(live, 'imb_p')
+    kpis = {'spot': None, 'res_share_now': None, 'price_trend': trend(prices, now), 'imb_trend': trend(imb_p, now),
+            'imb_spread': None}
+    if prices is not None:
+        pos = prices.index.searchsorted(now, side='right') - 1
+        kpis['spot'] = _first(_ffill(_values(prices))[pos]) if pos >= 0 else 0.0
+    if gen is not None:
+        row = _values(gen)[gen.index.get_indexer([now], method='nearest')[0]]
+        green, _ = green_columns(tuple(gen.columns))
+        total = np.nansum(row)
+        kpis['res_share_now'] = float(np.nansum(row[green]) / total * 100) if total else None
+    if imb_p is not None:
+        today = _values(imb_p.loc[now.normalize():])
+        if len(today):
+            mn, mx, _ = _col_stats(today)
+            kpis['imb_spread'] = mx - mn
+    return kpis
+
+
+# --- ЗАПАМ'ЯТОВУВАННЯ ЗА ВЕРСІЄЮ ДАНИХ ---
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def memoized(key, compute):
+    """Повертає compute() з кешу за ключем; ключ має містити версію даних."""
+    with _memo_lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            metrics.inc('ec_grid_cache_requests_total', cache='kpi', result='hit')
+            return _memo[key]
+    metrics.inc('ec_grid_cache_requests_total', cache='kpi', result='miss')
+    with metrics.timed('kpi', period=key[0]):
+        value = compute()
+    with _memo_lock:
+        _memo[key] = value
+        while len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+    return value
+
+
+def zone_kpis(zone, live, hist, now, live_version, hist_versions):
+    """Усі KPI зони для таблиць: 'today', 'yesterday', 'last_year' та 'live'.
+
+    live/hist — дані, вже прочитані зі сховища та кешу діб; версії задають ключ кешу.
+    "Сьогодні" — живі дані від початку доби (включно з уже відомим завтрашнім РДН).
+    """
+    today_start = now.normalize()
+    slot = now.floor('15min')
+    today = {k: (v.loc[today_start:] if v is not None else None) for k, v in live.items()}
+    return {
+        'today': memoized(('today', zone, today_start, live_version), lambda: period_kpis(today)),
+        'live': memoized(('live', zone, slot, live_version), lambda: live_kpis(live, now)),
+        **{label: memoized(('day', zone, hist_versions[label]), lambda d=data: period_kpis(d))
+           for label, data in hist.items()},
+    }
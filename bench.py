@@ -0,0 +1,265 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# --- БЕНЧМАРКИ ШЛЯХІВ ДАНИХ API ТА ДАШБОРДУ ---
+# Працюють повністю офлайн: ENTSO-E замінює standin.ReplayAdapter (записані або синтетичні фікстури)
+# із заданою затримкою та частотою помилок. Результати пишуться в JSON, щоб порівнювати прогони:
+#
+#   python bench.py --latency 0.2 --concurrency 50 --requests 2000
+#   python bench.py --compare .data/bench/old.json .data/bench/new.json
+
+RESULTS_DIR = os.path.join(os.environ.get("EC_GRID_DATA_DIR", ".data"), "bench")
+REPEATS = 20
+
+
+def summary(samples):
+    """Статистика затримок у мілісекундах."""
+    ms = np.asarray(samples, dtype=float) * 1000
+    if ms.size == 0:
+        return {"n": 0}
+    return {"n": int(ms.size), "mean_ms": round(float(ms.mean()), 3), "p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p90_ms": round(float(np.percentile(ms, 90)), 3), "p99_ms": round(float(np.percentile(ms, 99)), 3),
+            "max_ms": round(float(ms.max()), 3)}
+
+
+def timed(fn, *args, **kwargs):
+    t = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - t, result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Ті самі виклики, що fetch_current_data / fetch_comparison_stats у dashboard.py
+def fetch_current(store, api_key, zone, now):
+    import scheduler
+    from store import live_window
+    return store.refresh(api_key, zone, *live_window(now), max_age=scheduler.USER_MAX_AGE, background=True)
+
+
+def fetch_comparison(day_cache, api_key, zone, now):
+    import scheduler
+    dates = scheduler.history_days(now)
+    days = day_cache.get_many(api_key, zone, dates, max_age=scheduler.USER_HISTORY_MAX_AGE)
+    return {label: days[d.normalize()] for label, d in zip(('yesterday', 'last_year'), dates)}
+
+
+def bench_fetch(api_key, zones, root):
+    """Холодні (порожнє сховище) та теплі (повторний виклик) завантаження даних дашборду."""
+    import pandas as pd
+    from daycache import DayCache
+    from store import TimeSeriesStore, TZ
+    now = pd.Timestamp.now(tz=TZ)
+    result = {}
+    for name, make, fetch in (("fetch_current_data", lambda d: TimeSeriesStore(d), fetch_current),
+                              ("fetch_comparison_stats", lambda d: DayCache(os.path.join(d, 'days')), fetch_comparison)):
+        cold, warm = [], []
+        for zone in zones:
+            target = make(tempfile.mkdtemp(dir=root, prefix=f"{name}-"))
+            cold.append(timed(fetch, target, api_key, zone, now)[0])
+            warm.extend(timed(fetch, target, api_key, zone, now)[0] for _ in range(REPEATS))
+        result[name] = {"cold": summary(cold), "warm": summary(warm)}
+    return result
+
+
+def bench_backfill(api_key, zones, root):
+    """Дотягування початку діапазону до вже збереженого вікна (як /api/series на 7 діб після живих даних).
+
+    Падає, якщо хоч один набір повернувся з помилкою: інакше бенчмарк міряв би лише час відмови.
+    """
+    import pandas as pd
+    from store import TimeSeriesStore, TZ, LIVE_AHEAD, live_window
+    now = pd.Timestamp.now(tz=TZ)
+    samples = []
+    for zone in zones:
+        target = TimeSeriesStore(tempfile.mkdtemp(dir=root, prefix="backfill-"))
+        target.refresh(api_key, zone, *live_window(now))
+        samples.append(timed(target.refresh, api_key, zone, now - pd.Timedelta(days=7), now + LIVE_AHEAD)[0])
+        errors = target.status(zone)['errors']
+        if errors:
+            raise RuntimeError(f"backfill {zone} failed: {errors}")
+    return {"store_backfill": summary(samples)}
+
+
+def bench_kpi(api_key, zones):
+    """Підготовка KPI та графіків для кожної зони з уже теплого сховища.
+
+    chart_build — побудова й серіалізація фігур charts.* з нуля; chart_cached — повторний рендер
+    дашборду з тими самими даними: charts.figure з кешу плюс те, що робить st.plotly_chart
+    (перевірка фігури та серіалізація в JSON).
+    """
+    import pandas as pd
+    import plotly.io as pio
+    import plotly.tools
+    import analytics
+    import charts
+    import scheduler
+    from daycache import day_cache
+    from store import store, TZ
+    now = pd.Timestamp.now(tz=TZ)
+    slot = now.floor('15min')
+    compute, memo, build, cached = [], [], [], []
+    for zone in zones:
+        live = fetch_current(store, api_key, zone, now)
+        hist = fetch_comparison(day_cache, api_key, zone, now)
+        today = {k: (v.loc[now.normalize():] if v is not None else None) for k, v in live.items()}
+
+        def kpis():
+            return ([analytics.period_kpis(today)] + [analytics.period_kpis(d) for d in hist.values()]
+                    + [analytics.live_kpis(live, now)])
+        compute.extend(timed(kpis)[0] for _ in range(REPEATS))
+        versions = {label: day_cache.version(zone, d) for label, d in zip(hist, scheduler.history_days(now))}
+        analytics.zone_kpis(zone, live, hist, now, store.versions(zone), versions)
+        memo.extend(timed(analytics.zone_kpis, zone, live, hist, now, store.versions(zone), versions)[0]
+                    for _ in range(REPEATS))
+
+        # Ті самі графіки й вікна, що в dashboard.py
+        builders = {}
+        if live.get('prices') is not None:
+            builders['prices'] = lambda: charts.prices(live['prices'])
+        if live.get('imb_p') is not None:
+            builders['imbalance'] = lambda: charts.imbalance(live['imb_p'], live.get('imb_v'), slot - pd.Timedelta(hours=24), slot)
+        if live.get('gen') is not None:
+            builders['generation'] = lambda: charts.generation(live['gen'].loc[slot - pd.Timedelta(hours=24):slot].fillna(0))
+            if today['gen'] is not None and not today['gen'].empty:
+                builders['res'] = lambda: charts.res_profile(today['gen'])
+
+        def chart_build():
+            return [json.dumps(b(), ensure_ascii=False) for b in builders.values()]
+
+        def chart_cached():
+            figures = [charts.figure(zone, name, (store.versions(zone), slot), b) for name, b in builders.items()]
+            return [pio.to_json(plotly.tools.return_figure_from_figure_or_data(f, validate_figure=True), validate=False)
+                    for f in figures]
+        build.extend(timed(chart_build)[0] for _ in range(REPEATS))
+        chart_cached()
+        cached.extend(timed(chart_cached)[0] for _ in range(REPEATS))
+    return {"kpi_compute": summary(compute), "kpi_memoized": summary(memo),
+            "chart_build": summary(build), "chart_cached": summary(cached)}
+
+
+async def bench_api(zones, concurrency, total):
+    """Пропускна здатність і затримки /api/market/{zone} під конкурентним навантаженням (ASGI у процесі)."""
+    import httpx
+    import main
+    transport = httpx.ASGITransport(app=main.app)
+    result = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def run(phase, n, headers=None):
+            latencies, statuses = [], {}
+
+            async def worker(i):
+                for k in range(i, n, concurrency):
+                    zone = zones[k % len(zones)]
+                    t = time.perf_counter()
+                    r = await client.get(f"/api/market/{zone}", headers=headers(zone) if headers else None)
+                    latencies.append(time.perf_counter() - t)
+                    statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+            t = time.perf_counter()
+            await asyncio.gather(*(worker(i) for i in range(min(concurrency, n))))
+            elapsed = time.perf_counter() - t
+            result[phase] = {**summary(latencies), "rps": round(n / elapsed, 1),
+                             "status": {str(k): v for k, v in sorted(statuses.items())}}
+
+        # Холодний старт: перший запит по кожній зоні йде до (підміненого) ENTSO-E
+        await run("api_market_cold", len(zones))
+        await run("api_market_warm", total)
+        etags = {}
+        for zone in zones:
+            etags[zone] = (await client.get(f"/api/market/{zone}")).headers.get("etag")
+        await run("api_market_conditional", total, lambda zone: {"If-None-Match": etags[zone] or ""})
+    return result
+
+
+def compare(base_path, new_path):
+    """Таблиця змін усіх числових метрик між двома прогонами (>1 — повільніше для *_ms)."""
+    with open(base_path) as f: base = json.load(f)["results"]
+    with open(new_path) as f: new = json.load(f)["results"]
+
+    def flatten(d, prefix=""):
+        for k, v in d.items():
+            if isinstance(v, dict):
+                yield from flatten(v, f"{prefix}{k}.")
+            elif isinstance(v, (int, float)):
+                yield f"{prefix}{k}", v
+    old = dict(flatten(base))
+    print(f"{'metric':60} {'base':>12} {'new':>12} {'ratio':>8}")
+    for key, value in flatten(new):
+        if key in old:
+            ratio = value / old[key] if old[key] else float('nan')
+            print(f"{key:60} {old[key]:12.3f} {value:12.3f} {ratio:8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки EC GRID на офлайн-заміні ENTSO-E")
+    parser.add_argument("--fixtures", help="каталог фікстур (за замовчуванням — синтетичні у тимчасовому каталозі)")
+    parser.add_argument("--zones", help="коди зон через кому (за замовчуванням — усі з COUNTRY_INFO)")
+    parser.add_argument("--latency", type=float, default=0.2, help="середня затримка ENTSO-E, с")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--out", help="файл результатів JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="порівняти два файли результатів")
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    # Ізольований каталог даних: модулі читають EC_GRID_DATA_DIR під час імпорту
+    out = args.out or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{git_commit() or 'nogit'}.json")
+    work = tempfile.mkdtemp(prefix="ec-grid-bench-")
+    os.environ["EC_GRID_DATA_DIR"] = work
+    os.environ.setdefault("entsoe_key", "bench")
+
+    import standin
+    import upstream
+    from zones import COUNTRY_INFO
+    zones = args.zones.split(",") if args.zones else [i['zone'] for i in COUNTRY_INFO.values()]
+    fixtures = args.fixtures or os.path.join(work, "fixtures")
+    if not args.fixtures:
+        standin.synthesize(fixtures, zones)
+    adapter = standin.install(upstream._session, standin.ReplayAdapter(
+        fixtures, latency=args.latency, error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+        timeout_rate=args.timeout_rate, seed=0))
+    api_key = os.environ["entsoe_key"]
+
+    # API першим: його холодна фаза має починатися з порожнього спільного сховища
+    results = {}
+    results.update(asyncio.run(bench_api(zones, args.concurrency, args.requests)))
+    results.update(bench_fetch(api_key, zones, work))
+    results.update(bench_backfill(api_key, zones, work))
+    results.update(bench_kpi(api_key, zones))
+    results["upstream"] = {"requests": adapter.requests, **{k: v for k, v in upstream.stats().items() if k != "queued"}}
+
+    report = {
+        "meta": {"timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'), "commit": git_commit(),
+                 "python": sys.version.split()[0], "platform": platform.platform(),
+                 "fixtures": args.fixtures or "synthetic", "zones": zones,
+                 "config": {k: v for k, v in vars(args).items() if k not in ("compare", "out", "fixtures", "zones")}},
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f: json.dump(report, f, indent=2, ensure_ascii=False)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    print(f"Результати збережено: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+
+import pandas as pd
+
+# Роздільна здатність ринку (MTU): з 01.10.2025 SDAC торгує 15-хвилинними продуктами
+MTU_MINUTES = 15
+
+
+def ttl_to_next_mtu(minutes=MTU_MINUTES, min_ttl=5):
+    """Скільки секунд лишилось до наступної межі інтервалу ринку (15/60 хв)."""
+    now = pd.Timestamp.now(tz='UTC')
+    boundary = now.floor(f'{minutes}min') + pd.Timedelta(minutes=minutes)
+    return max((boundary - now).total_seconds(), min_ttl)
+
+
+class TTLCache:
+    """Кеш у пам'яті процесу з TTL та об'єднанням паралельних промахів.
+
+    Ключ — кортеж (зона, тип даних). Якщо кілька запитів одночасно не знайшли
+    значення для одного ключа, завантаження виконується лише один раз, а решта
+    чекає на його результат.
+
+    stale_ttl (stale-while-revalidate): ще стільки секунд після закінчення TTL старе
+    значення віддається одразу, а нове завантажується у фоні.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stale = 0
+        self._tasks = set()
+
+    def _claim(self, key, stale_ttl=0):
+        # Повертає (стан, значення, future): 'hit' — свіже значення; 'stale' — застаріле значення,
+        # future не None, якщо фонове оновлення маємо запустити ми; 'wait' — чекаємо чуже
+        # завантаження; 'load' — завантажуємо самі
+        with self._lock:
+            now = time.monotonic()
+            entry = self._data.get(key)
+            if entry is not None and entry[1] > now:
+                self.hits += 1
+                return 'hit', entry[0], None
+            fut = self._inflight.get(key)
+            if entry is not None and entry[1] + stale_ttl > now:
+                self.stale += 1
+                if fut is not None:
+                    return 'stale', entry[0], None
+                fut = self._inflight[key] = Future()
+                return 'stale', entry[0], fut
+            if fut is not None:
+                self.coalesced += 1
+                return 'wait', None, fut
+            self.misses += 1
+            fut = self._inflight[key] = Future()
+            return 'load', None, fut
+
+    def _resolve(self, key, fut, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + (ttl() if callable(ttl) else ttl))
+            self._inflight.pop(key, None)
+        fut.set_result(value)
+
+    def _fail(self, key, fut, e):
+        with self._lock:
+            self._inflight.pop(key, None)
+        fut.set_exception(e)
+
+    async def _aload(self, key, fut, loader, ttl):
+        try:
+            value = await loader()
+        except BaseException as e:
+            self._fail(key, fut, e)
+            raise
+        self._resolve(key, fut, value, ttl)
+        return value
+
+    async def aget_or_load(self, key, loader, ttl, stale_ttl=0):
+        """Значення з кешу або з loader() (корутина); паралельні промахи чекають на одне завантаження."""
+        state, value, fut = self._claim(key, stale_ttl)
+        if state == 'stale':
+            if fut is not None:
+                task = asyncio.ensure_future(self._aload(key, fut, loader, ttl))
+                self._tasks.add(task)
+                task.add_done_callback(self._background_done)
+            return value
+        if state == 'hit':
+            return value
+        if state == 'wait':
+            return await asyncio.wrap_future(fut)
+        return await self._aload(key, fut, loader, ttl)
+
+    def _background_done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled(): task.exception()  # помилку вже передано через future
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses + self.coalesced + self.stale
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "stale": self.stale,
+                "hit_ratio": round((self.hits + self.coalesced + self.stale) / total, 4) if total else 0.0,
+                "entries": len(self._data),
+                "inflight": len(self._inflight),
+            }
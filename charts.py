@@ -0,0 +1,135 @@
+import base64
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+
+import analytics
+import metrics
+from downsample import downsample
+
+# --- ГРАФІКИ ДАШБОРДУ ---
+# Фігури будуються як звичайні dict-специфікації Plotly (без викликів go.* на кожну трасу),
+# перевіряються один раз і зберігаються як готові go.Figure з ключем (зона, графік, версія даних).
+# Кеш спільний для всіх сесій Streamlit у процесі: повторний рендер, перемикання вкладки чи
+# інший користувач із тими самими даними не будують і не перевіряють фігуру заново —
+# st.plotly_chart лише серіалізує її (~2 мс на графік замість ~20 мс для dict-специфікації).
+# Масиви кодуються як типізовані масиви Plotly ({dtype, bdata}), а час — як мілісекунди
+# київського локального часу на осі типу date (так само, як рядки з часом без зсуву).
+
+# Більше точок на графіку користувач не розрізнить; довші ряди зменшуємо зі збереженням форми
+MAX_POINTS = 1500
+CACHE_BYTES = int(os.environ.get("EC_GRID_CHART_CACHE_MB", "64")) * 1024 * 1024
+
+TEMPLATE = pio.templates['plotly_dark'].to_plotly_json()
+MARGIN = dict(l=0, r=0, t=30, b=0)
+IMB_COLORS = [[0, '#ff0044'], [1, '#00ff41']]
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_size = 0
+
+
+def _array(values):
+    return {'dtype': 'f8', 'bdata': base64.b64encode(np.ascontiguousarray(values, dtype='<f8').tobytes()).decode()}
+
+
+def _x(index):
+    # Мілісекунди "настінного" київського часу: вісь показує той самий час, що й у таблицях
+    return _array(index.tz_localize(None).as_unit('ms').asi8)
+
+
+def _values(data):
+    return data.to_numpy(dtype=float).reshape(len(data), data.shape[1] if data.ndim == 2 else 1)
+
+
+def _layout(title, height, **extra):
+    return {'template': TEMPLATE, 'title': {'text': title}, 'height': height, 'margin': MARGIN,
+            'xaxis': {'type': 'date'}, **extra}
+
+
+def figure(zone, chart, version, build):
+    """Перевірена go.Figure з кешу; build() -> dict викликається лише для нової версії даних.
+
+    Фігура спільна для всіх сесій, тож її не можна змінювати після отримання.
+    """
+    global _cache_size
+    key = (zone, chart, version)
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None:
+            _cache.move_to_end(key)
+    metrics.inc('ec_grid_cache_requests_total', cache='chart', result='hit' if entry is not None else 'miss')
+    if entry is not None:
+        return entry[0]
+    with metrics.timed('chart', chart=chart):
+        spec = build()
+        # Розмір у кеші — за довжиною JSON (масиви вже закодовані в base64, тож це близько до пам'яті)
+        entry = (go.Figure(spec), len(json.dumps(spec)))
+    with _cache_lock:
+        if key not in _cache:
+            _cache[key] = entry
+            _cache_size += entry[1]
+        while _cache_size > CACHE_BYTES and len(_cache) > 1:
+            _, (_, size) = _cache.popitem(last=False)
+            _cache_size -= size
+    return entry[0]
+
+
+def imbalance(imb_p, imb_v, start, end):
+    """Ціни небалансу (права вісь) та обсяги стовпцями, червоні — дефіцит, зелені — профіцит."""
+    data = []
+    df_p = imb_p.loc[start:end].ffill().fillna(0)
+    prices = _values(df_p)
+    if prices.shape[1] > 1:
+        labels = ["Long (Надлишок)", "Short (Дефіцит)"]
+        for i, c in enumerate(df_p.columns):
+            name = labels[i] if i < 2 else str(c)
+            data.append({'type': 'scatter', 'x': _x(df_p.index), 'y': _array(prices[:, i]), 'name': f"Ціна {name}",
+                         'line': {'width': 2}, 'yaxis': 'y2'})
+    else:
+        data.append({'type': 'scatter', 'x': _x(df_p.index), 'y': _array(prices[:, 0]), 'name': "Ціна (Єдина)",
+                     'line': {'color': '#ffaa00', 'width': 2}, 'yaxis': 'y2'})
+    if imb_v is not None:
+        df_v = imb_v.loc[start:end].fillna(0)
+        vals = _values(df_v)[:, 0]
+        # Колір кожного стовпця — через числову шкалу (0/1), без списку кольорів на кожну точку
+        data.append({'type': 'bar', 'x': _x(df_v.index), 'y': _array(vals), 'name': "Обсяг (MW)", 'opacity': 0.5,
+                     'marker': {'color': _array(vals >= 0), 'colorscale': IMB_COLORS, 'cmin': 0, 'cmax': 1}})
+    return {'data': data, 'layout': _layout(
+        "Небаланси (24 год)", 450, xaxis={'type': 'date', 'anchor': 'y', 'domain': [0.0, 0.94]},
+        yaxis={'anchor': 'x', 'domain': [0.0, 1.0]}, yaxis2={'anchor': 'x', 'overlaying': 'y', 'side': 'right'},
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))}
+
+
+def _stack(frame, columns):
+    x = _x(frame.index)
+    values = _values(frame)
+    return [{'type': 'scatter', 'x': x, 'y': _array(values[:, i]), 'name': str(frame.columns[i]), 'stackgroup': 'one'}
+            for i in columns]
+
+
+def res_profile(gen):
+    """Стек "зелених" джерел за сьогодні (лише ті, що щось виробили)."""
+    g = gen.fillna(0)
+    green, _ = analytics.green_columns(tuple(g.columns))
+    sums = _values(g).sum(axis=0)
+    return {'data': _stack(g, green[sums[green] > 0]), 'layout': _layout("Профіль ВДЕ (Сьогодні)", 400)}
+
+
+def prices(series):
+    p = downsample(series, MAX_POINTS)
+    return {'data': [{'type': 'scatter', 'x': _x(p.index), 'y': _array(_values(p)[:, 0]), 'name': "Ціна",
+                      'line': {'color': '#00ff41', 'width': 2}}],
+            'layout': _layout("Динаміка РДН", 350)}
+
+
+def generation(gen):
+    """Стек генерації за джерелами; дрібні джерела (сума до 500 MW) не показуються."""
+    g_chart = downsample(gen, MAX_POINTS)
+    shown = np.flatnonzero(_values(gen).sum(axis=0) > 500)
+    return {'data': _stack(g_chart, shown), 'layout': _layout("Стек Генерації (24 год)", 450)}
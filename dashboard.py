@@ -1,12 +1,17 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-from entsoe import EntsoePandasClient
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from datetime import datetime, timedelta
+from datetime import timedelta
 import os
 
+from store import store, live_window
+from daycache import day_cache
+from zones import COUNTRY_INFO
+import scheduler
+import analytics
+import charts
+import metrics
+from rollups import rollups, WINDOW_DAYS
+
 # --- КОНФІГУРАЦІЯ ---
 st.set_page_config(page_title="EU GRID ANALYTICS", layout="wide", page_icon="🇪🇺")
 
@@ -47,6 +52,9 @@ if not api_key or not app_password:
     st.error("Помилка: Секрети (entsoe_key або app_password) не налаштовано в Environment Variables.")
     st.stop()
 
+# Фоновий планувальник тримає всі зони свіжими (один раз на процес)
+scheduler.start(api_key)
+
 def check_password():
     """Повертає True, якщо пароль введено правильно."""
     if st.session_state.get("password_correct", False):
@@ -73,143 +81,108 @@ if not check_password():
 # ОСНОВНИЙ КОД ДАШБОРДУ
 # ==========================================
 
-# --- ДОВІДНИК ---
-COUNTRY_INFO = {
-    "PL": {"name": "Польща", "tso": "PSE S.A.", "anom": "Вугільна інерція.", "cause": "80% вугілля.", "zone": "PL"},
-    "UA": {"name": "Україна", "tso": "Укренерго", "anom": "Дефіцит, обстріли.", "cause": "Війна.", "zone": "UA_IPS"},
-    "DE_LU": {"name": "Німеччина", "tso": "TenneT/Amprion", "anom": "Від'ємні ціни.", "cause": "Надлишок вітру.", "zone": "DE_LU"},
-    "FR": {"name": "Франція", "tso": "RTE", "anom": "Чутливість до холоду.", "cause": "Атомна енергетика.", "zone": "FR"},
-    "HU": {"name": "Угорщина", "tso": "MAVIR", "anom": "Дорогий імпорт.", "cause": "Дефіцит генерації.", "zone": "HU"},
-    "SK": {"name": "Словаччина", "tso": "SEPS", "anom": "Транзит.", "cause": "Інтеграція CZ-HU.", "zone": "SK"},
-    "RO": {"name": "Румунія", "tso": "Transelectrica", "anom": "Посухи.", "cause": "Гідрозалежність.", "zone": "RO"},
-    "CZ": {"name": "Чехія", "tso": "ČEPS", "anom": "Експорт.", "cause": "АЕС.", "zone": "CZ"},
-    "MD": {"name": "Молдова", "tso": "Moldelectrica", "anom": "Дефіцит.", "cause": "Немає генерації.", "zone": "MD"}
-}
-
 st.sidebar.header("⚙️ ПАНЕЛЬ КЕРУВАННЯ")
 selected_code = st.sidebar.selectbox("Оберіть Зону", list(COUNTRY_INFO.keys()), format_func=lambda x: f"{x} - {COUNTRY_INFO[x]['name']}")
 info = COUNTRY_INFO[selected_code]
 
-UA_GEN_MAP = {
-    'Biomass': 'Біомаса', 'Fossil Brown coal/Lignite': 'Вугілля (Буре)',
-    'Fossil Gas': 'Газ', 'Fossil Hard coal': 'Вугілля (Кам.)',
-    'Hydro Pumped Storage': 'ГАЕС', 'Hydro Run-of-river and poundage': 'ГЕС (Прот)',
-    'Hydro Water Reservoir': 'ГЕС (Вод)', 'Nuclear': 'АЕС',
-    'Solar': 'Сонце', 'Wind Offshore': 'Вітер (Море)', 'Wind Onshore': 'Вітер (Суша)',
-    'Waste': 'Відходи', 'Other': 'Інше', 'Fossil Oil': 'Мазут', 'Geothermal': 'Геотерм.'
-}
+# Фігури будує, перевіряє й кешує charts.py (за зоною, графіком і версією даних), спільно для всіх сесій;
+# на повторному рендері Streamlit лише серіалізує готову go.Figure
+def show_chart(fig, chart):
+    with metrics.timed('chart_render', chart=chart):
+        st.plotly_chart(fig, use_container_width=True)
 
-def safe_float(val):
-    try:
-        if isinstance(val, (pd.Series, pd.DataFrame)):
-            v = val.values.flatten()
-            v = v[~pd.isna(v)]
-            return float(v[0]) if len(v) > 0 else 0.0
-        return float(val) if not pd.isna(val) else 0.0
-    except: return 0.0
-
-@st.cache_data(ttl=300)
+# Дашборд лише читає локальне сховище, яке оновлює фоновий планувальник.
+# Застарілі дані показуємо одразу, а оновлюємо у фоні; чекаємо лише коли даних зони ще немає
 def fetch_current_data(api_key, country):
-    client = EntsoePandasClient(api_key=api_key)
     now = pd.Timestamp.now(tz='Europe/Kyiv')
-    start = now - timedelta(hours=48)
-    end = now + timedelta(hours=24)
-    data = {}
-    
-    def get(func, *args, **kwargs):
-        try:
-            res = func(*args, **kwargs)
-            if res is not None:
-                if res.index.tz is None: res.index = res.index.tz_localize('UTC').tz_convert('Europe/Kyiv')
-                else: res.index = res.index.tz_convert('Europe/Kyiv')
-                return res[~res.index.duplicated(keep='last')]
-        except: return None
-        return None
+    return store.refresh(api_key, country, *live_window(now), max_age=scheduler.USER_MAX_AGE, background=True)
 
-    try:
-        data['prices'] = get(client.query_day_ahead_prices, country, start=start, end=end)
-        data['load'] = get(client.query_load, country, start=start, end=end)
-        data['imb_p'] = get(client.query_imbalance_prices, country, start=start, end=end)
-        data['imb_v'] = get(client.query_imbalance_volumes, country, start=start, end=end)
-        gen = get(client.query_generation, country, start=start, end=end)
-        if gen is not None:
-            if isinstance(gen.columns, pd.MultiIndex): gen.columns = gen.columns.get_level_values(0)
-            gen = gen.groupby(level=0, axis=1).sum().rename(columns=UA_GEN_MAP)
-        data['gen'] = gen
-    except: pass
-    return data
+# Врегульовані доби (рік тому) беруться з постійного кешу на диску, "вчора" — з кешу планувальника
+def comparison_dates(now):
+    return {'yesterday': now - timedelta(days=1), 'last_year': now - timedelta(days=365)}
 
-@st.cache_data(ttl=3600)
 def fetch_comparison_stats(api_key, country):
-    client = EntsoePandasClient(api_key=api_key)
-    now = pd.Timestamp.now(tz='Europe/Kyiv')
-    dates = {'yesterday': now - timedelta(days=1), 'last_year': now - timedelta(days=365)}
-    stats = {}
-    for label, date in dates.items():
-        s = date.replace(hour=0, minute=0)
-        e = date.replace(hour=23, minute=59)
-        res = {'prices': None, 'load': None, 'gen': None, 'imb_p': None, 'imb_v': None}
-        try:
-            res['prices'] = client.query_day_ahead_prices(country, start=s, end=e)
-            try: res['load'] = client.query_load(country, start=s, end=e)
-            except: pass
-            try: res['imb_p'] = client.query_imbalance_prices(country, start=s, end=e)
-            except: pass
-            try: res['imb_v'] = client.query_imbalance_volumes(country, start=s, end=e)
-            except: pass
-            gen = client.query_generation(country, start=s, end=e)
-            if gen is not None:
-                if isinstance(gen.columns, pd.MultiIndex): gen.columns = gen.columns.get_level_values(0)
-                gen = gen.groupby(level=0, axis=1).sum().rename(columns=UA_GEN_MAP)
-            res['gen'] = gen
-        except: pass
-        stats[label] = res
-    return stats
-
-def analyze_period_change(series, hours=4):
-    if series is None or series.empty: return "Немає даних", 0
-    now = series.index[-1]
-    past = now - timedelta(hours=hours)
-    try:
-        val_now = safe_float(series.asof(now))
-        val_past = safe_float(series.asof(past))
-        diff = val_now - val_past
-        pct = (diff / val_past * 100) if val_past != 0 else 0
-        trend = "📈" if diff > 0 else "📉"
-        sign = "+" if diff > 0 else ""
-        return f"{trend} {sign}{diff:.1f}€ ({abs(pct):.0f}%)", diff
-    except: return "Помилка", 0
+    dates = comparison_dates(pd.Timestamp.now(tz='Europe/Kyiv'))
+    days = day_cache.get_many(api_key, country, list(dates.values()), max_age=scheduler.USER_HISTORY_MAX_AGE)
+    return {label: days[date.normalize()] for label, date in dates.items()}
+
+def format_age(status):
+    if status['data_age_s'] is None: return "ще не завантажені"
+    minutes = status['data_age_s'] // 60
+    return "щойно" if minutes < 1 else f"{minutes} хв тому"
+
+# Поки йде фонове оновлення, раз на кілька секунд перевіряємо, чи воно завершилось, і перемальовуємо сторінку
+@st.fragment(run_every=3)
+def watch_refresh(zone):
+    if not store.refreshing(zone):
+        st.rerun()
+
+def format_trend(t):
+    if t is None: return "Немає даних"
+    trend = "📈" if t['diff'] > 0 else "📉"
+    sign = "+" if t['diff'] > 0 else ""
+    return f"{trend} {sign}{t['diff']:.1f}€ ({abs(t['pct']):.0f}%)"
 
 now = pd.Timestamp.now(tz='Europe/Kyiv')
 
+with st.spinner(f"📡 З'єднання з ENTSO-E ({info['zone']}). Отримання свіжих даних..."):
+    with metrics.timed('dashboard_fetch'):
+        live_data = fetch_current_data(api_key, info['zone'])
+        hist_data = fetch_comparison_stats(api_key, info['zone'])
+
+refreshing = store.refreshing(info['zone'])
+data_status = store.status(info['zone'], list(live_data))
+data_age = format_age(data_status) + (" · ⏳ оновлюються у фоні" if refreshing else "")
+
 col_title, col_btn = st.columns([3, 1])
 with col_title:
     st.title(f"⚡ {info['name']} ({selected_code})")
-    st.markdown(f"<div class='status-time'>🕒 Стан даних на: {now.strftime('%d.%m.%Y %H:%M:%S')}</div>", unsafe_allow_html=True)
+    st.markdown(f"<div class='status-time'>🕒 Стан даних на: {now.strftime('%d.%m.%Y %H:%M:%S')} · ENTSO-E: {data_age}</div>", unsafe_allow_html=True)
 with col_btn:
     st.write("") 
-    if st.button("🔄 ОНОВИТИ ДАНІ", type="primary", use_container_width=True):
-        st.cache_data.clear() 
+    # Скидаємо лише живі дані обраної зони: до завершення фонового оновлення видно попередні значення
+    if st.button("🔄 ОНОВИТИ ДАНІ", type="primary", use_container_width=True, disabled=refreshing):
+        store.invalidate(info['zone'])
         st.rerun() 
+if refreshing:
+    watch_refresh(info['zone'])
+if data_status['errors']:
+    st.warning(f"⚠️ ENTSO-E зараз не відповідає ({', '.join(data_status['errors'])}) — показано останні збережені дані.")
 
 with st.expander(f"ℹ️ ДОСЬЄ: {info['name']}", expanded=False):
     c1, c2 = st.columns(2)
     c1.markdown(f"**ОСП:** {info['tso']}")
     c2.markdown(f"**Аномалії:** {info['anom']}")
 
-with st.spinner(f"📡 З'єднання з ENTSO-E ({info['zone']}). Отримання свіжих даних..."):
-    live_data = fetch_current_data(api_key, info['zone'])
-    hist_data = fetch_comparison_stats(api_key, info['zone'])
-
-today_start = now.replace(hour=0, minute=0)
+today_start = now.normalize()
+slot = now.floor('15min')
 data_today = {k: (v.loc[today_start:] if v is not None else None) for k, v in live_data.items()}
 
+# Усі показники таблиць рахує спільний KPI-двигун (той самий, що й для API) і кешує за версією даних
+kpis = analytics.zone_kpis(info['zone'], live_data, hist_data, now, store.versions(info['zone']),
+                           {label: day_cache.version(info['zone'], d) for label, d in comparison_dates(now).items()})
+live_kpis = kpis['live']
+
+# Довгі порівняння — з добових зведень (rollups), без завантаження сирих даних за місяць чи рік
+rollup_kpis = rollups.period_kpis(info['zone'], now - timedelta(days=WINDOW_DAYS), now - timedelta(days=1))
+rollup_summary = rollups.summary(info['zone'], now, metrics=['price', 'imb_price'])
+WINDOW_LABEL = f"{WINDOW_DAYS} днів"
+
+def format_rollup(r, label):
+    # "вища за N% інтервалів за рік · той самий день тижня рік тому: X €"
+    parts = []
+    if r['today_percentile'] is not None:
+        parts.append(f"{label} сьогодні вища за {r['today_percentile']:.0f}% інтервалів за останній рік")
+    if r['same_weekday_last_year'].get('avg') is not None:
+        parts.append(f"той самий день тижня рік тому ({r['same_weekday_last_year']['date']}): {r['same_weekday_last_year']['avg']:.2f} €")
+    return " · ".join(parts)
+
 if live_data.get('prices') is not None and hist_data['yesterday'].get('prices') is not None:
     try:
-        y_avg = safe_float(hist_data['yesterday']['prices'].mean())
-        y_max = safe_float(hist_data['yesterday']['prices'].max())
-        t_avg = safe_float(data_today['prices'].mean()) if data_today['prices'] is not None else 0
-        t_now = safe_float(live_data['prices'].asof(now))
+        y_avg = kpis['yesterday']['price']['raw_avg']
+        y_max = kpis['yesterday']['price']['raw_max']
+        t_avg = kpis['today']['price']['raw_avg'] if kpis['today']['price'] else 0
+        t_now = live_kpis['spot']
         
         st.markdown(f"""
         <div class='analysis-box'>
@@ -221,22 +194,13 @@ if live_data.get('prices') is not None and hist_data['yesterday'].get('prices')
     except: pass
 
 if live_data.get('prices') is not None:
-    curr_price = safe_float(live_data['prices'].asof(now))
     k1, k2, k3, k4 = st.columns(4)
-    k1.metric("Спот Ціна", f"{curr_price:.2f} €", help="Поточна ціна електроенергії на РДН")
+    k1.metric("Спот Ціна", f"{live_kpis['spot']:.2f} €", help="Поточна ціна електроенергії на РДН")
     
-    res_txt = "N/A"
-    if live_data.get('gen') is not None:
-        try:
-            g_now = live_data['gen'].iloc[live_data['gen'].index.get_indexer([now], method='nearest')[0]]
-            green_cols = [c for c in g_now.index if any(x in c for x in ['Вітер','Сонце','ГЕС','Біо'])]
-            res_share = (g_now[green_cols].sum() / g_now.sum() * 100)
-            res_txt = f"{res_share:.1f}%"
-        except: pass
+    res_txt = f"{live_kpis['res_share_now']:.1f}%" if live_kpis['res_share_now'] is not None else "N/A"
     k2.metric("Частка ВДЕ", res_txt, help="Відсоток зеленої енергетики в міксі")
     
-    trend_txt, _ = analyze_period_change(live_data['prices'])
-    k3.metric("Тренд (4г)", trend_txt, help="Зміна ціни за останні 4 години")
+    k3.metric("Тренд (4г)", format_trend(live_kpis['price_trend']), help="Зміна ціни за останні 4 години")
     k4.metric("Статус", "ONLINE 🟢", help="Зв'язок із сервером встановлено")
 
     tabs = st.tabs(["⚖️ Небаланси", "🌱 Зелена Енергія", "📉 РДН (Spot)", "🏗️ Генерація"])
@@ -246,138 +210,93 @@ if live_data.get('prices') is not None:
         col_g, col_a = st.columns([2, 1])
         with col_a:
             st.markdown("#### 📊 Аналіз")
-            imb_trend, _ = analyze_period_change(live_data.get('imb_p'))
-            st.info(f"Тренд ціни (4г): {imb_trend}")
-            if data_today.get('imb_p') is not None:
-                try:
-                    p_max = safe_float(data_today['imb_p'].max())
-                    p_min = safe_float(data_today['imb_p'].min())
-                    st.write(f"**Спред:** {(p_max - p_min):.2f} €")
-                except: pass
+            st.info(f"Тренд ціни (4г): {format_trend(live_kpis['imb_trend'])}")
+            if live_kpis['imb_spread'] is not None:
+                st.write(f"**Спред:** {live_kpis['imb_spread']:.2f} €")
             
-            def get_imb_stats(d):
-                if d is None: return ["-"] * 5
-                p_avg = safe_float(d['imb_p'].mean()) if d.get('imb_p') is not None else 0
-                v_max_l = safe_float(d['imb_v'].max()) if d.get('imb_v') is not None else 0
-                v_max_s = safe_float(d['imb_v'].min()) if d.get('imb_v') is not None else 0
-                p_max = safe_float(d['imb_p'].max()) if d.get('imb_p') is not None else 0
-                p_min = safe_float(d['imb_p'].min()) if d.get('imb_p') is not None else 0
-                return [f"{p_max:.1f} €", f"{p_min:.1f} €", f"{p_avg:.1f} €", f"{v_max_l:.0f} MW", f"{v_max_s:.0f} MW"]
+            def get_imb_stats(k):
+                i = k['imbalance']
+                if i is None: return ["-"] * 5
+                return [f"{i['price_max']:.1f} €", f"{i['price_min']:.1f} €", f"{i['price_avg']:.1f} €", f"{i['surplus_max_mw']:.0f} MW", f"{i['deficit_max_mw']:.0f} MW"]
 
             df_imb = pd.DataFrame({
                 "Показник": ["Макс. Ціна", "Мін. Ціна", "Сер. Ціна", "Макс. Профіцит (+)", "Макс. Дефіцит (-)"],
-                "Сьогодні": get_imb_stats(data_today),
-                "Вчора": get_imb_stats(hist_data['yesterday']),
-                "Рік тому": get_imb_stats(hist_data['last_year'])
+                "Сьогодні": get_imb_stats(kpis['today']),
+                "Вчора": get_imb_stats(kpis['yesterday']),
+                "Рік тому": get_imb_stats(kpis['last_year']),
+                WINDOW_LABEL: get_imb_stats(rollup_kpis)
             })
             st.table(df_imb)
+            imb_note = format_rollup(rollup_summary['imb_price'], "Сер. ціна небалансу")
+            if imb_note: st.caption(imb_note)
 
         with col_g:
             if live_data.get('imb_p') is not None:
-                fig = make_subplots(specs=[[{"secondary_y": True}]])
-                df_p = live_data['imb_p'].loc[now-timedelta(hours=24):now].ffill().fillna(0)
-                if isinstance(df_p, pd.DataFrame) and len(df_p.columns) > 1:
-                    labels = ["Long (Надлишок)", "Short (Дефіцит)"]
-                    for i, c in enumerate(df_p.columns):
-                        name = labels[i] if i < 2 else str(c)
-                        fig.add_trace(go.Scatter(x=df_p.index, y=df_p[c], name=f"Ціна {name}", line=dict(width=2)), secondary_y=True)
-                else:
-                    y_vals = df_p.values.flatten() if isinstance(df_p, pd.DataFrame) else df_p.values
-                    fig.add_trace(go.Scatter(x=df_p.index, y=y_vals, name="Ціна (Єдина)", line=dict(color='#ffaa00', width=2)), secondary_y=True)
-                
-                if live_data.get('imb_v') is not None:
-                    df_v = live_data['imb_v'].loc[now-timedelta(hours=24):now].fillna(0)
-                    vals = df_v.values.flatten()
-                    cols = ['#ff0044' if x<0 else '#00ff41' for x in vals]
-                    fig.add_trace(go.Bar(x=df_v.index, y=vals, marker_color=cols, name="Обсяг (MW)", opacity=0.5), secondary_y=False)
-                fig.update_layout(template="plotly_dark", height=450, title="Небаланси (24 год)", margin=dict(l=0, r=0, t=30, b=0), legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
-                st.plotly_chart(fig, use_container_width=True)
+                fig = charts.figure(info['zone'], 'imbalance', (store.version(info['zone'], 'imb_p'), store.version(info['zone'], 'imb_v'), slot),
+                                    lambda: charts.imbalance(live_data['imb_p'], live_data.get('imb_v'), slot - timedelta(hours=24), slot))
+                show_chart(fig, 'imbalance')
 
     with tabs[1]:
         st.markdown("### 🌱 Аналіз ВДЕ")
-        def calc_res_stats(dataset):
-            if (dataset is None or dataset.get('gen') is None or dataset['gen'].empty): return ["-"] * 6
-            gen = dataset['gen'].fillna(0)
-            green_cols = [c for c in gen.columns if any(x in c for x in ['Вітер','Сонце','ГЕС','Біо'])]
-            total_mw = safe_float(gen.sum().sum())
-            green_mw = safe_float(gen[green_cols].sum().sum())
-            share_res = (green_mw / total_mw * 100) if total_mw > 0 else 0
-            avg_p = safe_float(dataset['prices'].mean()) if dataset.get('prices') is not None else 0
-            est_val = green_mw * avg_p / 1000000 
-            def safe_sum(term):
-                cols = [c for c in gen.columns if term in c]
-                return safe_float(gen[cols].sum().sum()) if cols else 0
-            return [f"{share_res:.1f}%", f"{green_mw/1000:.1f} GWh", f"{est_val:.2f} млн €",
-                    f"{(safe_sum('Сонце')/green_mw*100 if green_mw else 0):.0f}%",
-                    f"{(safe_sum('Вітер')/green_mw*100 if green_mw else 0):.0f}%",
-                    f"{(safe_sum('ГЕС')/green_mw*100 if green_mw else 0):.0f}%"]
+        def calc_res_stats(k):
+            r = k['res']
+            if r is None: return ["-"] * 6
+            return [f"{r['share_pct']:.1f}%", f"{r['green_gwh']:.1f} GWh", f"{r['value_meur']:.2f} млн €",
+                    f"{r['solar_pct']:.0f}%", f"{r['wind_pct']:.0f}%", f"{r['hydro_pct']:.0f}%"]
 
         c1, c2 = st.columns([1, 2])
         with c1:
             df_res = pd.DataFrame({
                 "Показник": ["Частка ВДЕ", "Обсяг", "Вартість (Est.)", "Сонце (Mix)", "Вітер (Mix)", "Гідро (Mix)"],
-                "Сьогодні": calc_res_stats(data_today),
-                "Вчора": calc_res_stats(hist_data['yesterday']),
-                "Рік тому": calc_res_stats(hist_data['last_year'])
+                "Сьогодні": calc_res_stats(kpis['today']),
+                "Вчора": calc_res_stats(kpis['yesterday']),
+                "Рік тому": calc_res_stats(kpis['last_year']),
+                WINDOW_LABEL: calc_res_stats(rollup_kpis)
             })
             st.table(df_res)
         with c2:
             if data_today.get('gen') is not None and not data_today['gen'].empty:
-                g = data_today['gen'].fillna(0)
-                green = [c for c in g.columns if any(x in c for x in ['Вітер','Сонце','ГЕС','Біо'])]
-                if green:
-                    fig = go.Figure()
-                    for c in green: 
-                        if g[c].sum() > 0:
-                            fig.add_trace(go.Scatter(x=g.index, y=g[c], name=c, stackgroup='one'))
-                    fig.update_layout(template="plotly_dark", title="Профіль ВДЕ (Сьогодні)", height=400, margin=dict(l=0, r=0, t=30, b=0))
-                    st.plotly_chart(fig, use_container_width=True)
+                if len(analytics.green_columns(tuple(data_today['gen'].columns))[0]):
+                    fig = charts.figure(info['zone'], 'res', (store.version(info['zone'], 'gen'), today_start.date()),
+                                        lambda: charts.res_profile(data_today['gen']))
+                    show_chart(fig, 'res')
 
     with tabs[2]:
         st.markdown("### 📉 РДН")
-        def calc_dam_stats(dataset):
-            if dataset is None or dataset.get('prices') is None: return ["-"] * 5
-            p = dataset['prices'].ffill()
-            l = dataset.get('load')
-            avg, mn, mx = safe_float(p.mean()), safe_float(p.min()), safe_float(p.max())
-            vol_gwh = safe_float(l.sum()) / 1000 if l is not None else 0
-            cost_m = 0
-            if l is not None:
-                try:
-                    if isinstance(p, pd.DataFrame): p = p.iloc[:,0]
-                    if isinstance(l, pd.DataFrame): l = l.iloc[:,0]
-                    comb = pd.concat([p, l], axis=1).dropna()
-                    cost_m = safe_float((comb.iloc[:,0] * comb.iloc[:,1]).sum()) / 1000000
-                except: pass
-            return [f"{mn:.2f} €", f"{mx:.2f} €", f"{avg:.2f} €", f"{vol_gwh:.1f} GWh", f"{cost_m:.2f} млн €"]
+        def calc_dam_stats(k):
+            p, m = k['price'], k['market']
+            if p is None: return ["-"] * 5
+            return [f"{p['min']:.2f} €", f"{p['max']:.2f} €", f"{p['avg']:.2f} €", f"{m['volume_gwh']:.1f} GWh",
+                    f"{m['turnover_meur']:.2f} млн €" if m['turnover_meur'] is not None else "-"]
 
         df_dam = pd.DataFrame({
             "Показник": ["Мін. Ціна", "Макс. Ціна", "Сер. Ціна", "Обсяг (Load)", "Оборот Ринку"],
-            "Сьогодні": calc_dam_stats(data_today),
-            "Вчора": calc_dam_stats(hist_data['yesterday']),
-            "Рік тому": calc_dam_stats(hist_data['last_year'])
+            "Сьогодні": calc_dam_stats(kpis['today']),
+            "Вчора": calc_dam_stats(kpis['yesterday']),
+            "Рік тому": calc_dam_stats(kpis['last_year']),
+            WINDOW_LABEL: calc_dam_stats(rollup_kpis)
         })
         st.table(df_dam)
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x=live_data['prices'].index, y=live_data['prices'].values, name="Ціна", line=dict(color='#00ff41', width=2)))
-        fig.update_layout(template="plotly_dark", height=350, title="Динаміка РДН", margin=dict(l=0, r=0, t=30, b=0))
-        st.plotly_chart(fig, use_container_width=True)
+        dam_note = format_rollup(rollup_summary['price'], "Сер. ціна РДН")
+        st.caption(" · ".join(filter(None, [dam_note, f"обсяг у колонці «{WINDOW_LABEL}» — в середньому за добу"])))
+        fig = charts.figure(info['zone'], 'prices', (store.version(info['zone'], 'prices'), slot), lambda: charts.prices(live_data['prices']))
+        show_chart(fig, 'prices')
 
     with tabs[3]:
         st.markdown("### 🏗️ Генерація")
         if live_data.get('gen') is not None:
-            g = live_data['gen'].loc[now-timedelta(hours=24):now].fillna(0)
+            g = live_data['gen'].loc[slot - timedelta(hours=24):slot].fillna(0)
             if not g.empty:
                 last_row = g.iloc[-1].sort_values(ascending=False)
                 st.write(f"**Поточний мікс:**")
                 cols = st.columns(5)
                 for i, (k, v) in enumerate(last_row.head(5).items()):
                     cols[i].metric(k, f"{v:.0f} MW")
-            fig = go.Figure()
-            for c in g.columns:
-                if g[c].sum() > 500: fig.add_trace(go.Scatter(x=g.index, y=g[c], name=c, stackgroup='one'))
-            fig.update_layout(template="plotly_dark", height=450, title="Стек Генерації (24 год)", margin=dict(l=0, r=0, t=30, b=0))
-            st.plotly_chart(fig, use_container_width=True)
+            fig = charts.figure(info['zone'], 'generation', (store.version(info['zone'], 'gen'), slot), lambda: charts.generation(g))
+            show_chart(fig, 'generation')
         else: st.warning("Дані відсутні")
 else:
     st.warning(f"❌ Дані для зони {selected_code} тимчасово недоступні.")
+
+# Знімок метрик процесу дашборду для /metrics API (не частіше ніж раз на metrics.EXPORT_EVERY с)
+metrics.export("dashboard")
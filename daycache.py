@@ -0,0 +1,178 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+import pandas as pd
+from entsoe.exceptions import NoMatchingDataError
+
+import metrics
+import upstream
+from store import DATA_DIR, TZ, normalize, atomic_write
+
+# --- ПОСТІЙНИЙ КЕШ ІСТОРИЧНИХ ДІБ ---
+# Дані за доби, які вже пройшли врегулювання (settlement), ENTSO-E більше не змінює:
+# зберігаємо їх на диску назавжди з ключем (зона, дата, набір даних).
+# Доби, які ще можуть уточнюватись, теж лежать на диску, але видаються лише
+# поки файл молодший за max_age — інакше завантажуються заново.
+
+SETTLEMENT_DAYS = int(os.environ.get("EC_GRID_SETTLEMENT_DAYS", "7"))
+MAX_BYTES = int(os.environ.get("EC_GRID_DAYCACHE_MB", "256")) * 1024 * 1024
+MEMORY_DAYS = 64
+
+_SERIES_COL = '__series__'
+
+
+def is_settled(day, now=None):
+    now = now or pd.Timestamp.now(tz=TZ)
+    return day.normalize() <= now.normalize() - timedelta(days=SETTLEMENT_DAYS)
+
+
+class DayCache:
+    def __init__(self, root=os.path.join(DATA_DIR, 'days'), max_bytes=MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._mem = OrderedDict()
+        self._size = None
+
+    def _path(self, zone, day, dataset, ext):
+        return os.path.join(self.root, zone, dataset, f"{day.strftime('%Y-%m-%d')}.{ext}")
+
+    def _read(self, zone, day, dataset, max_age=None):
+        # Повертає (знайдено, дані); файл .empty означає "ENTSO-E не має даних за цю добу".
+        # max_age=None — доба врегульована, вік файлу не важливий
+        for ext in ('parquet', 'empty'):
+            path = self._path(zone, day, dataset, ext)
+            try: mtime = os.stat(path).st_mtime
+            except OSError: continue
+            if max_age is not None and time.time() - mtime > max_age:
+                return False, None
+            if ext == 'empty':
+                return True, None
+            try:
+                frame = pd.read_parquet(path)
+                # Позначка використання для LRU — через atime, щоб mtime (версія даних) не змінювався
+                if max_age is None: os.utime(path, (time.time(), mtime))
+                if list(frame.columns) == [_SERIES_COL]: frame = frame[_SERIES_COL].rename(None)
+                return True, frame
+            except (OSError, ValueError): pass
+        return False, None
+
+    def _write(self, zone, day, dataset, frame):
+        path = self._path(zone, day, dataset, 'parquet' if frame is not None else 'empty')
+        stale = self._path(zone, day, dataset, 'empty' if frame is not None else 'parquet')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Перезапис (або заміна двійника .empty/.parquet) не додає нових байтів понад різницю розмірів
+        replaced = sum(self._size_of(p) for p in (path, stale))
+        if frame is None:
+            atomic_write(path, lambda tmp: open(tmp, 'w').close())
+        else:
+            atomic_write(path, (frame.to_frame(_SERIES_COL) if isinstance(frame, pd.Series) else frame).to_parquet)
+        try: os.remove(stale)
+        except OSError: pass
+        self._evict(os.path.getsize(path) - replaced)
+
+    @staticmethod
+    def _size_of(path):
+        try: return os.path.getsize(path)
+        except OSError: return 0
+
+    def _scan(self):
+        files = []
+        for dirpath, _, names in os.walk(self.root):
+            for n in names:
+                p = os.path.join(dirpath, n)
+                try:
+                    st = os.stat(p)
+                    files.append((max(st.st_atime, st.st_mtime), st.st_size, p))
+                except OSError: pass
+        return files
+
+    def _evict(self, added):
+        # Витісняємо найдавніше використані файли, коли кеш перевищує max_bytes
+        with self._lock:
+            if self._size is None:
+                self._size = sum(f[1] for f in self._scan())
+            else:
+                self._size += added
+            if self._size <= self.max_bytes:
+                return
+            # Рахуємо від фактичного вмісту диска (його змінюють і інші процеси), а не від лічильника
+            files = sorted(self._scan())
+            size = sum(f[1] for f in files)
+            for _, file_size, path in files:
+                if size <= self.max_bytes * 0.9:
+                    break
+                try:
+                    os.remove(path)
+                    size -= file_size
+                except OSError: pass
+            self._size = size
+            self._mem.clear()
+
+    def version(self, zone, day, datasets=None):
+        """Версія даних доби: дата та mtime файлів кешу (змінюється лише при перезаписі)."""
+        day = day.normalize()
+        mtimes = []
+        for ds in datasets or upstream.DATASETS:
+            for ext in ('parquet', 'empty'):
+                try:
+                    mtimes.append(os.stat(self._path(zone, day, ds, ext)).st_mtime_ns)
+                    break
+                except OSError: pass
+            else:
+                mtimes.append(0)
+        return day.strftime('%Y-%m-%d'), tuple(mtimes)
+
+    def get_many(self, api_key, zone, days, datasets=None, max_age=0, priority=upstream.USER):
+        """Повертає {доба: {набір: дані або None}}; з ENTSO-E тягнемо лише те, чого немає в кеші.
+
+        Неврегульовані доби беруться з диска, лише якщо їх завантажено менше ніж max_age секунд тому.
+        """
+        datasets = list(datasets or upstream.DATASETS)
+        days = [day.normalize() for day in days]
+        result = {day: {} for day in days}
+        queries = {}
+        for day in days:
+            settled = is_settled(day)
+            for ds in datasets:
+                key = (zone, day, ds)
+                if settled:
+                    with self._lock:
+                        hit = key in self._mem
+                        if hit: result[day][ds] = self._mem[key]
+                    if hit:
+                        metrics.inc('ec_grid_cache_requests_total', cache='day_memory', result='hit')
+                        continue
+                found, frame = self._read(zone, day, ds, None if settled else max_age)
+                metrics.inc('ec_grid_cache_requests_total', cache='day_disk', result='hit' if found else 'miss')
+                if found:
+                    if settled: self._remember(key, frame)
+                    result[day][ds] = frame
+                    continue
+                queries[(day, ds)] = (ds, day, day.replace(hour=23, minute=59))
+        if queries:
+            raw = upstream.fan_out(api_key, zone, queries, return_exceptions=True, priority=priority)
+            for (day, ds), res in raw.items():
+                frame = None
+                if not isinstance(res, Exception):
+                    try: frame = normalize(ds, res)
+                    except Exception: res = None
+                result[day][ds] = frame
+                # Зберігаємо успішні дані або підтверджену відсутність даних (помилки — ні)
+                if frame is not None or isinstance(res, NoMatchingDataError):
+                    self._write(zone, day, ds, frame)
+                    if is_settled(day): self._remember((zone, day, ds), frame)
+        return result
+
+    def _remember(self, key, frame):
+        with self._lock:
+            self._mem[key] = frame
+            self._mem.move_to_end(key)
+            while len(self._mem) > MEMORY_DAYS * len(upstream.DATASETS):
+                self._mem.popitem(last=False)
+
+
+day_cache = DayCache()
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+# --- ЗМЕНШЕННЯ КІЛЬКОСТІ ТОЧОК ДЛЯ ГРАФІКІВ ---
+# Річний 15-хв ряд — ~35 тис. точок на зону; телефону й Plotly досить кількох сотень,
+# якщо зберегти форму кривої (піки та провали).
+
+METHODS = ('lttb', 'minmax')
+
+
+def lttb_indices(x, y, n):
+    """Largest-Triangle-Three-Buckets: індекси n точок, що найкраще зберігають форму кривої."""
+    size = len(y)
+    if n >= size or n < 3:
+        return np.arange(size)
+    edges = np.linspace(1, size - 1, n - 1).astype(int)
+    idx = np.empty(n, dtype=int)
+    idx[0], idx[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = hi, (edges[i + 2] if i + 2 < n - 1 else size)
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        idx[i + 1] = a
+    return idx
+
+
+def minmax_indices(y, n):
+    """Мінімум і максимум у кожному з n/2 рівних кошиків (повністю векторно)."""
+    size = len(y)
+    buckets = max(n // 2, 1)
+    if n >= size:
+        return np.arange(size)
+    bucket = np.arange(size) * buckets // size
+    order = np.lexsort((y, bucket))
+    starts = np.searchsorted(bucket[order], np.arange(buckets))
+    ends = np.append(starts[1:], size) - 1
+    return np.unique(np.concatenate([order[starts], order[ends]]))
+
+
+def downsample(data, points, method='lttb'):
+    """Повертає підмножину рядків Series/DataFrame приблизно з `points` точок.
+
+    Для DataFrame точки розподіляються між колонками, а результат — об'єднання
+    вибраних моментів часу, тож усі колонки лишаються на спільній осі.
+    """
+    if data is None or len(data) <= points:
+        return data
+    frame = data.to_frame() if isinstance(data, pd.Series) else data
+    x = frame.index.asi8.astype(float)
+    per_col = max(points // max(frame.shape[1], 1), 3)
+    selected = []
+    for col in range(frame.shape[1]):
+        y = frame.iloc[:, col].to_numpy(dtype=float)
+        valid = np.flatnonzero(~np.isnan(y))
+        if len(valid) == 0:
+            continue
+        if method == 'minmax':
+            picked = minmax_indices(y[valid], per_col)
+        else:
+            picked = lttb_indices(x[valid], y[valid], per_col)
+        selected.append(valid[picked])
+    if not selected:
+        return data.iloc[:0]
+    return data.iloc[np.unique(np.concatenate(selected))]
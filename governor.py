@@ -0,0 +1,215 @@
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+import requests
+
+# --- ГУБЕРНАТОР ЗАПИТІВ ДО ENTSO-E ---
+# Усі запити процесу проходять через одну чергу з пріоритетами:
+#  * token bucket не дає перевищити квоту ENTSO-E (400 запитів/хв на користувача);
+#  * коли токенів бракує, першими йдуть запити користувачів, потім живі дані планувальника, потім історія;
+#  * circuit breaker після серії збоїв (або 429 від ENTSO-E) на якийсь час відхиляє запити одразу,
+#    а пауза росте експоненційно, поки збої повторюються; викликачі тим часом віддають збережені дані.
+
+log = logging.getLogger(__name__)
+
+USER, LIVE, HISTORY = 0, 1, 2
+
+QUOTA_PER_MINUTE = int(os.environ.get("ENTSOE_QUOTA_PER_MINUTE", "400"))
+# Губернатор свій у кожному процесі (воркери API, Streamlit), а квота одна на ключ: ділимо її порівну
+# між ENTSOE_PROCESSES процесами (за замовчуванням API + дашборд) і лишаємо запас 10%.
+# Якщо процесів більше, ніж вказано, разом вони можуть перевищити квоту
+PROCESSES = max(int(os.environ.get("ENTSOE_PROCESSES", "2")), 1)
+RATE_PER_MINUTE = QUOTA_PER_MINUTE * 0.9 / PROCESSES
+BURST = int(os.environ.get("ENTSOE_BURST", "20"))
+
+FAILURE_THRESHOLD = 5
+BACKOFF_BASE = 5
+BACKOFF_MAX = 300
+
+
+class CircuitOpenError(Exception):
+    """ENTSO-E тимчасово не опитується після серії збоїв."""
+
+    def __init__(self, retry_in):
+        super().__init__(f"ENTSO-E тимчасово недоступний, повтор через {retry_in:.0f} с")
+        self.retry_in = retry_in
+
+
+def is_upstream_failure(e):
+    # Збій сервісу (мережа, таймаут, 429/5xx), а не "немає даних" чи помилка в параметрах запиту
+    if isinstance(e, requests.HTTPError):
+        status = e.response.status_code if e.response is not None else 0
+        return status == 429 or status >= 500
+    return isinstance(e, (requests.ConnectionError, requests.Timeout))
+
+
+def retry_after(e):
+    try: return float(e.response.headers['Retry-After'])
+    except (AttributeError, KeyError, TypeError, ValueError): return None
+
+
+class TokenBucket:
+    """Не потокобезпечний: його охороняє блокування Governor."""
+
+    def __init__(self, rate_per_minute, burst):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.tokens = float(burst)
+        self._at = time.monotonic()
+
+    def take(self):
+        # 0 — токен узято, інакше скільки секунд чекати на наступний
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._at) * self.rate)
+        self._at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def drain(self):
+        self.tokens = 0.0
+        self._at = time.monotonic()
+
+
+class CircuitBreaker:
+    def __init__(self, threshold=FAILURE_THRESHOLD, base=BACKOFF_BASE, max_backoff=BACKOFF_MAX):
+        self.threshold = threshold
+        self.base = base
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.backoff = base
+        self.open_until = 0.0
+        self._probing = False
+
+    def retry_in(self):
+        return max(self.open_until - time.monotonic(), 0)
+
+    def allow(self):
+        """Закритий — пропускає все; відкритий — нічого; після паузи пропускає один пробний запит."""
+        with self._lock:
+            if self.open_until == 0:
+                return True
+            if self._probing or time.monotonic() < self.open_until:
+                return False
+            self._probing = True
+            return True
+
+    def success(self):
+        with self._lock:
+            if self.open_until:
+                log.info("ENTSO-E circuit closed")
+            self.failures = 0
+            self.backoff = self.base
+            self.open_until = 0.0
+            self._probing = False
+
+    def failure(self, delay=None):
+        with self._lock:
+            self.failures += 1
+            if not (self._probing or self.failures >= self.threshold or delay):
+                return
+            pause = delay or self.backoff * random.uniform(0.8, 1.2)
+            self.open_until = time.monotonic() + pause
+            self.backoff = min(self.backoff * 2, self.max_backoff)
+            self._probing = False
+            log.warning("ENTSO-E circuit open for %.0fs after %d failures", pause, self.failures)
+
+    def state(self):
+        if self.open_until == 0:
+            return "closed"
+        return "half-open" if self._probing or self.retry_in() == 0 else "open"
+
+
+class Governor:
+    """Пул воркерів, що виконує запити в порядку пріоритету в межах квоти."""
+
+    def __init__(self, workers, rate_per_minute=RATE_PER_MINUTE, burst=BURST):
+        self.bucket = TokenBucket(rate_per_minute, burst)
+        self.breaker = CircuitBreaker()
+        self._cond = threading.Condition()
+        self._queue = []
+        self._seq = itertools.count()
+        self.executed = 0
+        self.rejected = 0
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"entsoe-{i}", daemon=True).start()
+
+    def submit(self, fn, priority=USER):
+        """Ставить fn у чергу й повертає concurrent.futures.Future."""
+        fut = Future()
+        if self.breaker.retry_in() > 0:
+            self._reject(fut)
+            return fut
+        with self._cond:
+            heapq.heappush(self._queue, (priority, next(self._seq), fut, fn))
+            self._cond.notify()
+        return fut
+
+    def _reject(self, fut):
+        self.rejected += 1
+        if fut.set_running_or_notify_cancel():
+            fut.set_exception(CircuitOpenError(self.breaker.retry_in()))
+
+    def _next(self):
+        # Токен береться лише тоді, коли є що виконувати, і дістається найважливішому запиту в черзі
+        with self._cond:
+            while True:
+                if not self._queue:
+                    self._cond.wait()
+                    continue
+                wait = self.bucket.take()
+                if wait:
+                    self._cond.wait(wait)
+                    continue
+                _, _, fut, fn = heapq.heappop(self._queue)
+                if not fut.set_running_or_notify_cancel():
+                    self.bucket.tokens += 1  # скасований запит токен не витрачає
+                    continue
+                if not self.breaker.allow():
+                    self.bucket.tokens += 1
+                    return fut, None
+                return fut, fn
+
+    def _work(self):
+        while True:
+            fut, fn = self._next()
+            if fn is None:
+                self.rejected += 1
+                fut.set_exception(CircuitOpenError(self.breaker.retry_in()))
+                continue
+            try:
+                result = fn()
+            except BaseException as e:
+                if is_upstream_failure(e):
+                    if e.response is not None and e.response.status_code == 429:
+                        with self._cond: self.bucket.drain()
+                    self.breaker.failure(retry_after(e))
+                else:
+                    self.breaker.success()
+                fut.set_exception(e)
+            else:
+                self.breaker.success()
+                fut.set_result(result)
+            self.executed += 1
+
+    def stats(self):
+        with self._cond:
+            queued = [p for p, *_ in self._queue]
+            tokens = self.bucket.tokens
+        return {
+            "state": self.breaker.state(),
+            "retry_in_s": round(self.breaker.retry_in(), 1),
+            "consecutive_failures": self.breaker.failures,
+            "tokens": round(tokens, 1),
+            "queued": {name: queued.count(p) for name, p in (("user", USER), ("live", LIVE), ("history", HISTORY))},
+            "executed": self.executed,
+            "rejected": self.rejected,
+        }
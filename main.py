@@ -1,42 +1,476 @@
-from fastapi import FastAPI, HTTPException
-from entsoe import EntsoePandasClient
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+import numpy as np
 import pandas as pd
 from datetime import timedelta
+import asyncio
+import hashlib
+import io
+import json
 import os
+import time
+
+import pyarrow as pa
+
+from cache import TTLCache, ttl_to_next_mtu
+from store import store, live_window, RETENTION, RETRY_AFTER
+from daycache import day_cache
+from rollups import rollups, METRICS, ROLLUP_DAYS, WINDOW_DAYS
+import analytics
+import metrics
+from downsample import downsample, METHODS
+from push import Hub, event_stream
+from zones import ZONES
+import scheduler
+import upstream
+
+# Фоновий планувальник тримає всі зони COUNTRY_INFO свіжими, тож ендпоінти лише читають сховище.
+# Цикл push-потоку розсилає підписникам /api/stream оновлення цін, щойно змінились дані
+@asynccontextmanager
+async def lifespan(app):
+    api_key = os.environ.get("entsoe_key")
+    if api_key:
+        scheduler.start(api_key)
+    task = asyncio.create_task(price_hub.run())
+    yield
+    task.cancel()
+    scheduler.stop()
 
 # Створюємо наш API додаток
-app = FastAPI(title="EC GRID API")
+app = FastAPI(title="EC GRID API", lifespan=lifespan)
+# Великі відповіді (ряди, KPI, пакетні) стискаються, якщо клієнт підтримує gzip; SSE не стискається
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+# Час кожного запиту за маршрутом (до кінця тіла відповіді); з заголовком X-Debug-Timing: 1
+# (або EC_GRID_TIMING_HEADER=1 для всіх) відповідь містить Server-Timing з розбивкою за етапами.
+# Звичайний ASGI-middleware, а не @app.middleware("http"): той обгортає кожне SSE-з'єднання окремою
+# задачею й буфером. Тривалість SSE-з'єднань у гістограму затримок не потрапляє
+TIMING_HEADER = os.environ.get("EC_GRID_TIMING_HEADER") == "1"
+
+class TimingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        t = time.perf_counter()
+        debug = TIMING_HEADER or (b"x-debug-timing", b"1") in scope["headers"]
+        status, event_stream = 500, False
+
+        async def send_timed(message):
+            nonlocal status, event_stream
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = message.get("headers", [])
+                event_stream = any(k == b"content-type" and v.startswith(b"text/event-stream") for k, v in headers)
+                if debug:
+                    timing = metrics.server_timing(entries, time.perf_counter() - t)
+                    message = {**message, "headers": [*headers, (b"server-timing", timing.encode())]}
+            await send(message)
+
+        with metrics.trace() as entries:
+            try:
+                await self.app(scope, receive, send_timed)
+            finally:
+                if not event_stream:
+                    route = scope.get("route")
+                    metrics.observe("ec_grid_http_request_seconds", time.perf_counter() - t,
+                                    route=route.path if route else "unmatched", method=scope["method"], status=status)
+
+app.add_middleware(TimingMiddleware)
+
+# Спільний кеш відповідей ENTSO-E: ключ (зона, тип даних), TTL до наступного інтервалу ринку.
+# Після закінчення TTL ще STALE_TTL секунд віддаємо попередні ціни, а нові вантажимо у фоні
+market_cache = TTLCache()
+STALE_TTL = scheduler.USER_MAX_AGE
+
+async def load_prices(api_key, country_code):
+    now = pd.Timestamp.now(tz='Europe/Kyiv')
+    start = now - timedelta(hours=24)
+    end = now + timedelta(hours=24)
+    # Зазвичай дані вже підготував планувальник; інакше сховище дотягне з ENTSO-E лише відсутні точки
+    data = await asyncio.to_thread(store.refresh, api_key, country_code, start, end, ['prices'], scheduler.USER_MAX_AGE, True)
+    if data['prices'] is None:
+        raise ValueError(f"немає даних РДН для зони {country_code}")
+    return data['prices']
+
+def get_prices(api_key, country_code):
+    # Ціни з кешу; паралельні промахи (у т.ч. з пакетного запиту) чекають на одне завантаження
+    return market_cache.aget_or_load((country_code, "prices"), lambda: load_prices(api_key, country_code),
+                                      ttl=ttl_to_next_mtu, stale_ttl=STALE_TTL)
+
+def get_api_key():
+    api_key = os.environ.get("entsoe_key")
+    if not api_key:
+        raise HTTPException(status_code=500, detail="Ключ ENTSO-E не знайдено на сервері")
+    return api_key
+
+def check_zones(*zones):
+    # Код зони стає каталогом сховища, міткою метрик і ключем кешів: приймаємо лише відомі зони
+    unknown = [z for z in zones if z not in ZONES]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Невідомі зони: {', '.join(unknown)}. Доступні: {', '.join(sorted(ZONES))}")
+
+def upstream_error(e):
+    # Відкритий circuit breaker і жодних збережених даних: 503 з підказкою, коли повторити
+    wait = upstream.retry_in()
+    if wait > 0:
+        return HTTPException(status_code=503, detail=f"ENTSO-E тимчасово недоступний: {str(e)}",
+                             headers={"Retry-After": str(int(wait) + 1)})
+    return HTTPException(status_code=500, detail=f"Помилка ENTSO-E: {str(e)}")
+
+def freshness(zone, datasets=None):
+    # Якщо ENTSO-E недоступний, віддаються останні вдалі дані з позначкою stale
+    status = store.status(zone, datasets)
+    return {"stale": status["stale"], "data_age_s": status["data_age_s"]}
+
+# --- HTTP-КЕШУВАННЯ ---
+# ETag будується з версії даних у сховищі (а не з тіла, де є поточний час), тож клієнт чи CDN
+# отримує 304 без тіла, поки дані не змінились. max-age — до наступного очікуваного оновлення:
+# межі 15-хв інтервалу (змінюється спот-ціна) або наступного опитування ENTSO-E планувальником
+def etag_for(*version):
+    return 'W/"%s"' % hashlib.blake2b(repr(version).encode(), digest_size=8).hexdigest()
+
+def max_age_for(zone, datasets, now, stale=False):
+    if stale:
+        return RETRY_AFTER
+    until = min(scheduler.next_run(zone, ds, now) for ds in datasets)
+    return int(max(min(ttl_to_next_mtu(), (until - now).total_seconds()), 1))
+
+def cache_headers(etag, max_age):
+    return {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+
+def not_modified(request, etag, max_age):
+    # If-None-Match зі слабким порівнянням (W/ ігнорується); повертає готову відповідь 304 або None
+    tags = [t.strip().removeprefix("W/") for t in request.headers.get("if-none-match", "").split(",")]
+    if "*" in tags or etag.removeprefix("W/") in tags:
+        return Response(status_code=304, headers=cache_headers(etag, max_age))
+    return None
+
+def num(value, digits=2):
+    # JSON не підтримує NaN: відсутні значення віддаємо як null
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+def num_matrix(values, digits=2):
+    values = np.round(values, digits)
+    return np.where(np.isnan(values), None, values).tolist()
+
+def zone_summary(country_code, prices, now):
+    """Компактний зріз по зоні: спот-ціна, тренд за 4 год, мін/макс/сер за сьогодні (спільний analytics)."""
+    live = analytics.live_kpis({'prices': prices}, now)
+    today = prices.loc[now.normalize():now.normalize() + pd.DateOffset(days=1) - timedelta(seconds=1)]
+    day = analytics.period_kpis({'prices': today})['price'] if len(today) else None
+    trend = live['price_trend']
+    return {
+        "zone": country_code,
+        "current_spot_price_eur": num(live['spot']),
+        "trend_4h_eur": num(trend['diff']),
+        "trend_4h_pct": num(trend['pct'], 1),
+        "day_min_eur": num(day['min']) if day else None,
+        "day_max_eur": num(day['max']) if day else None,
+        "day_avg_eur": num(day['avg']) if day else None,
+        **freshness(country_code, ["prices"]),
+        "status": "success"
+    }
+
+def spread_matrix(zones, series, now):
+    """Матриця спредів між зонами за один векторний прохід по вирівняних рядах цін.
+
+    now: поточний спред (рядок мінус стовпець); avg_abs: середній модуль спреду за сьогодні.
+    """
+    day = now.normalize()
+    aligned = pd.concat(series, axis=1, keys=zones).sort_index().ffill().loc[day:day + pd.DateOffset(days=1) - timedelta(seconds=1)]
+    values = aligned.to_numpy(dtype=float)
+    current = aligned.asof(now).to_numpy(dtype=float)
+    diff = values[:, :, None] - values[:, None, :]
+    return {
+        "zones": zones,
+        "now": num_matrix(current[:, None] - current[None, :]),
+        "avg_abs": num_matrix(np.nanmean(np.abs(diff), axis=0)),
+    }
 
 # Головна сторінка (просто для перевірки, що сервер живий)
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "⚡ EC GRID API успішно працює! Готовий віддавати дані мобільному додатку."}
 
 # Ендпоінт для отримання цін РДН
 @app.get("/api/market/{country_code}")
-def get_market_data(country_code: str):
-    api_key = os.environ.get("entsoe_key")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="Ключ ENTSO-E не знайдено на сервері")
+async def get_market_data(country_code: str, request: Request, response: Response):
+    api_key = get_api_key()
+    check_zones(country_code)
+    now = pd.Timestamp.now(tz='Europe/Kyiv')
+
+    try:
+        # Отримуємо ціни (з кешу; паралельні промахи чекають на один запит до ENTSO-E)
+        prices = await get_prices(api_key, country_code)
+    except Exception as e:
+        raise upstream_error(e)
+
+    fresh = freshness(country_code, ["prices"])
+    etag = etag_for(country_code, store.version(country_code, "prices"), now.floor('15min'), fresh["stale"])
+    max_age = max_age_for(country_code, ["prices"], now, fresh["stale"])
+    cached = not_modified(request, etag, max_age)
+    if cached:
+        return cached
+    response.headers.update(cache_headers(etag, max_age))
+
+    # Знаходимо поточну ціну
+    current_price = float(prices.asof(now)) if not prices.empty else 0.0
+
+    # Віддаємо чисті дані для майбутнього iPhone-додатка
+    return {
+        "zone": country_code,
+        "current_spot_price_eur": round(current_price, 2),
+        "timestamp": now.strftime('%Y-%m-%d %H:%M:%S'),
+        **fresh,
+        "status": "success"
+    }
+
+# Пакетний ендпоінт: кілька зон за один запит, усі завантажуються паралельно
+MAX_BATCH_ZONES = 20
+
+@app.get("/api/market")
+async def get_market_batch(request: Request, response: Response, zones: str, spread: bool = False):
+    api_key = get_api_key()
+    codes = list(dict.fromkeys(z.strip() for z in zones.split(",") if z.strip()))
+    if not codes or len(codes) > MAX_BATCH_ZONES:
+        raise HTTPException(status_code=400, detail=f"Вкажіть від 1 до {MAX_BATCH_ZONES} зон через кому")
+    check_zones(*codes)
 
-    client = EntsoePandasClient(api_key=api_key)
     now = pd.Timestamp.now(tz='Europe/Kyiv')
-    start = now - timedelta(hours=24)
-    end = now + timedelta(hours=24)
+    results = await asyncio.gather(*(get_prices(api_key, c) for c in codes), return_exceptions=True)
+
+    stale = any(isinstance(r, Exception) or freshness(c, ["prices"])["stale"] for c, r in zip(codes, results))
+    etag = etag_for(spread, now.floor('15min'), stale,
+                    *((c, None if isinstance(r, Exception) else store.version(c, "prices")) for c, r in zip(codes, results)))
+    max_age = min(max_age_for(c, ["prices"], now, stale) for c in codes)
+    cached = not_modified(request, etag, max_age)
+    if cached:
+        return cached
+    response.headers.update(cache_headers(etag, max_age))
+
+    payload = {"timestamp": now.strftime('%Y-%m-%d %H:%M:%S'), "zones": []}
+    ok = {}
+    for code, prices in zip(codes, results):
+        if isinstance(prices, Exception):
+            payload["zones"].append({"zone": code, "status": "error", "detail": f"Помилка ENTSO-E: {prices}"})
+            continue
+        payload["zones"].append(zone_summary(code, prices, now))
+        ok[code] = prices
+    if spread and len(ok) > 1:
+        payload["spread_eur"] = spread_matrix(list(ok), list(ok.values()), now)
+    return payload
+
+# --- ІСТОРИЧНІ РЯДИ ---
+# Довгі діапазони зменшуються на сервері (LTTB / мін-макс) і можуть віддаватися потоком:
+# NDJSON (рядок на точку) або Arrow IPC (пакети по STREAM_CHUNK рядків)
+MAX_SERIES_DAYS = 400
+MAX_POINTS = 10000
+STREAM_CHUNK = 5000
+
+def parse_time(value, default):
+    if value is None:
+        return default
+    ts = pd.Timestamp(value)
+    return ts.tz_localize('Europe/Kyiv') if ts.tz is None else ts.tz_convert('Europe/Kyiv')
 
+def load_series(api_key, zone, dataset, start, end):
+    return store.refresh(api_key, zone, start, end, [dataset], scheduler.USER_MAX_AGE, background=True)[dataset]
+
+def series_frame(data, points, method):
+    frame = data.to_frame('value') if isinstance(data, pd.Series) else data
+    frame.columns = [str(c) for c in frame.columns]
+    return downsample(frame, points, method) if points else frame
+
+def ndjson_stream(header, frame):
+    yield json.dumps(header, ensure_ascii=False) + "\n"
+    times = frame.index.strftime('%Y-%m-%dT%H:%M:%S%z')
+    values = frame.to_numpy(dtype=float)
+    for i in range(0, len(frame), STREAM_CHUNK):
+        chunk = np.where(np.isnan(values[i:i + STREAM_CHUNK]), None, values[i:i + STREAM_CHUNK]).tolist()
+        yield "".join(json.dumps({"t": t, "v": v}) + "\n" for t, v in zip(times[i:i + STREAM_CHUNK], chunk))
+
+def arrow_stream(frame):
+    table = pa.Table.from_pandas(frame.rename_axis('t').reset_index(), preserve_index=False)
+    buf = io.BytesIO()
+    with pa.ipc.new_stream(buf, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=STREAM_CHUNK):
+            writer.write_batch(batch)
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+@app.get("/api/series/{zone}/{dataset}")
+async def get_series(zone: str, dataset: str, request: Request, response: Response, start: str = None, end: str = None,
+                     points: int = Query(1000, ge=0, le=MAX_POINTS), method: str = "lttb", format: str = "json"):
+    api_key = get_api_key()
+    check_zones(zone)
+    if dataset not in upstream.DATASETS:
+        raise HTTPException(status_code=404, detail=f"Невідомий набір даних. Доступні: {', '.join(upstream.DATASETS)}")
+    if method not in METHODS or format not in ("json", "ndjson", "arrow"):
+        raise HTTPException(status_code=400, detail="method: lttb|minmax, format: json|ndjson|arrow")
+    now = pd.Timestamp.now(tz='Europe/Kyiv')
     try:
-        # Отримуємо ціни
-        prices = client.query_day_ahead_prices(country_code, start=start, end=end)
-        
-        # Знаходимо поточну ціну
-        current_price = float(prices.asof(now)) if not prices.empty else 0.0
-
-        # Віддаємо чисті дані для майбутнього iPhone-додатка
-        return {
-            "zone": country_code,
-            "current_spot_price_eur": round(current_price, 2),
-            "timestamp": now.strftime('%Y-%m-%d %H:%M:%S'),
-            "status": "success"
-        }
+        start_ts = parse_time(start, now - timedelta(days=7))
+        end_ts = parse_time(end, now + timedelta(days=1))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Невірний формат start/end (очікується ISO 8601)")
+    if not start_ts < end_ts or end_ts - start_ts > timedelta(days=MAX_SERIES_DAYS):
+        raise HTTPException(status_code=400, detail=f"Діапазон має бути додатним і не довшим за {MAX_SERIES_DAYS} днів")
+    # Старіші точки сховище не зберігає: такий запит щоразу тягнув би їх з ENTSO-E і відкидав
+    if start_ts < now - RETENTION:
+        raise HTTPException(status_code=400, detail=f"Дані доступні лише за останні {RETENTION.days} днів")
+
+    try:
+        data = await asyncio.to_thread(load_series, api_key, zone, dataset, start_ts, end_ts)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Помилка ENTSO-E: {str(e)}")
+        raise upstream_error(e)
+    if data is None:
+        raise HTTPException(status_code=404, detail=f"Немає даних {dataset} для зони {zone}")
+
+    # Перевірка версії — до зменшення точок і серіалізації
+    fresh = freshness(zone, [dataset])
+    etag = etag_for(zone, dataset, store.version(zone, dataset), start, end, points, method, format, fresh["stale"])
+    max_age = max_age_for(zone, [dataset], now, fresh["stale"])
+    cached = not_modified(request, etag, max_age)
+    if cached:
+        return cached
+    frame = await asyncio.to_thread(series_frame, data, points, method)
+
+    header = {"zone": zone, "dataset": dataset, "start": start_ts.isoformat(), "end": end_ts.isoformat(),
+              "columns": list(frame.columns), "points": len(frame), **fresh}
+    if format == "ndjson":
+        return StreamingResponse(ndjson_stream(header, frame), media_type="application/x-ndjson",
+                                 headers=cache_headers(etag, max_age))
+    if format == "arrow":
+        return StreamingResponse(arrow_stream(frame), media_type="application/vnd.apache.arrow.stream",
+                                 headers=cache_headers(etag, max_age))
+    response.headers.update(cache_headers(etag, max_age))
+    values = frame.to_numpy(dtype=float)
+    header["t"] = frame.index.strftime('%Y-%m-%dT%H:%M:%S%z').tolist()
+    header["values"] = {c: num_matrix(values[:, i]) for i, c in enumerate(frame.columns)}
+    return header
+
+# --- KPI ЗОНИ ---
+# Ті самі попередньо пораховані показники, що й у таблицях дашборду (спільний analytics.zone_kpis)
+def load_kpis(api_key, zone):
+    now = pd.Timestamp.now(tz='Europe/Kyiv')
+    live = store.refresh(api_key, zone, *live_window(now), max_age=scheduler.USER_MAX_AGE, background=True)
+    dates = {'yesterday': now - timedelta(days=1), 'last_year': now - timedelta(days=365)}
+    days = day_cache.get_many(api_key, zone, list(dates.values()), max_age=scheduler.USER_HISTORY_MAX_AGE)
+    hist = {label: days[d.normalize()] for label, d in dates.items()}
+    versions = {label: day_cache.version(zone, d) for label, d in dates.items()}
+    live_version = store.versions(zone)
+    version = (zone, live_version, tuple(versions.values()), now.floor('15min'))
+    return now, version, analytics.zone_kpis(zone, live, hist, now, live_version, versions)
+
+def json_numbers(value):
+    if isinstance(value, dict):
+        return {k: json_numbers(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [json_numbers(v) for v in value]
+    return num(value) if isinstance(value, float) else value
+
+@app.get("/api/kpi/{zone}")
+async def get_kpis(zone: str, request: Request, response: Response):
+    api_key = get_api_key()
+    check_zones(zone)
+    try:
+        now, version, kpis = await asyncio.to_thread(load_kpis, api_key, zone)
+    except Exception as e:
+        raise upstream_error(e)
+    fresh = freshness(zone)
+    etag = etag_for(*version, fresh["stale"])
+    max_age = max_age_for(zone, upstream.DATASETS, now, fresh["stale"])
+    cached = not_modified(request, etag, max_age)
+    if cached:
+        return cached
+    response.headers.update(cache_headers(etag, max_age))
+    return {"zone": zone, "timestamp": now.strftime('%Y-%m-%d %H:%M:%S'), **json_numbers(kpis),
+            **fresh, "status": "success"}
+
+# --- ДОВГІ ПОРІВНЯННЯ ---
+# Відповіді з добових зведень (rollups): середнє/мін/макс/квантилі за days діб і за рік, перцентиль
+# сьогоднішнього середнього за рік, той самий день тижня рік тому, за бажанням — профіль за годинами доби
+def load_rollups(zone, now, days, names, profile):
+    window = (now.normalize() - timedelta(days=days), now.normalize() - timedelta(days=1))
+    return rollups.summary(zone, now, days, names, profile), rollups.period_kpis(zone, *window)
+
+@app.get("/api/rollups/{zone}")
+async def get_rollups(zone: str, request: Request, response: Response, days: int = Query(WINDOW_DAYS, ge=1, le=ROLLUP_DAYS),
+                      names: str = Query(None, alias="metrics"), profile: bool = False):
+    check_zones(zone)
+    codes = [m.strip() for m in names.split(",") if m.strip()] if names else list(METRICS.values())
+    unknown = [m for m in codes if m not in METRICS.values() and not m.startswith("gen:")]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Невідомі метрики: {', '.join(unknown)}. Доступні: {', '.join(METRICS.values())}, gen:<джерело>")
+    now = pd.Timestamp.now(tz='Europe/Kyiv')
+    etag = etag_for(zone, await asyncio.to_thread(rollups.version, zone), now.normalize(), days, tuple(codes), profile)
+    max_age = max_age_for(zone, upstream.DATASETS, now)
+    cached = not_modified(request, etag, max_age)
+    if cached:
+        return cached
+    summary, kpis = await asyncio.to_thread(load_rollups, zone, now, days, codes, profile)
+    response.headers.update(cache_headers(etag, max_age))
+    return {"zone": zone, "timestamp": now.strftime('%Y-%m-%d %H:%M:%S'), "window_days": days,
+            "metrics": json_numbers(summary), "kpis": json_numbers(kpis), "fuels": rollups.fuels(zone), "status": "success"}
+
+# --- PUSH-ПОТІК ЦІН ---
+# Оновлення зони рахується, коли змінилась версія цін у сховищі, настав новий 15-хв інтервал
+# (змінюється поточна спот-ціна) або дані стали/перестали бути застарілими
+MAX_STREAM_CLIENTS = int(os.environ.get("EC_GRID_MAX_STREAM_CLIENTS", "10000"))
+
+def stream_version(zone):
+    now = pd.Timestamp.now(tz='Europe/Kyiv')
+    return store.version(zone, 'prices'), now.floor('15min'), store.status(zone, ['prices'])['stale']
+
+async def stream_snapshot(zone):
+    prices = await load_prices(get_api_key(), zone)
+    return zone_summary(zone, prices, pd.Timestamp.now(tz='Europe/Kyiv'))
+
+price_hub = Hub(stream_version, stream_snapshot)
+
+@app.get("/api/stream")
+async def stream_prices(zones: str):
+    get_api_key()
+    codes = list(dict.fromkeys(z.strip() for z in zones.split(",") if z.strip()))
+    if not codes or len(codes) > MAX_BATCH_ZONES:
+        raise HTTPException(status_code=400, detail=f"Вкажіть від 1 до {MAX_BATCH_ZONES} зон через кому")
+    check_zones(*codes)
+    if price_hub.clients >= MAX_STREAM_CLIENTS:
+        raise HTTPException(status_code=503, detail="Забагато підключень, спробуйте пізніше", headers={"Retry-After": "30"})
+    return StreamingResponse(event_stream(price_hub, codes), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/api/stream/stats")
+def get_stream_stats():
+    return price_hub.stats()
+
+# Лічильники кешу: misses = кількість реальних запитів до ENTSO-E
+@app.get("/api/cache/stats")
+def get_cache_stats():
+    return market_cache.stats()
+
+@metrics.collector
+def api_metrics():
+    cache = market_cache.stats()
+    results = {'hit': 'hits', 'miss': 'misses', 'coalesced': 'coalesced', 'stale': 'stale'}
+    return ([('counter', 'ec_grid_cache_requests_total', {'cache': 'market', 'result': r}, cache[k])
+             for r, k in results.items()]
+            + [('gauge', 'ec_grid_stream_clients', {}, price_hub.clients)])
+
+# Метрики для Prometheus: етапи гарячих шляхів, кеші, черга та стан ENTSO-E, час запитів API (і дашборду)
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Стан губернатора запитів: circuit breaker, токени квоти, черга за пріоритетами
+@app.get("/api/upstream/stats")
+def get_upstream_stats():
+    return upstream.stats()
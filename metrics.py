@@ -0,0 +1,186 @@
+import contextvars
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# --- МЕТРИКИ ГАРЯЧИХ ШЛЯХІВ (формат Prometheus) ---
+# Лічильники, гейджі та гістограми в пам'яті процесу без зовнішніх залежностей.
+# timed(stage) міряє етап (запит до ENTSO-E, нормалізація, KPI, побудова графіка) і, якщо
+# всередині HTTP-запиту ввімкнено trace(), додає його до розбивки для заголовка Server-Timing.
+# Дашборд працює в окремому процесі Streamlit: він періодично скидає свій знімок у EXPORT_DIR,
+# а /metrics в API віддає і власні метрики, і свіжі знімки інших процесів (з мітками process/pid).
+
+EXPORT_DIR = os.path.join(os.environ.get("EC_GRID_DATA_DIR", ".data"), "metrics")
+EXPORT_EVERY = 10
+EXPORT_MAX_AGE = 600
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+HELP = {
+    'ec_grid_stage_seconds': "Тривалість етапів обробки (stage: upstream, normalize, kpi, chart, ...)",
+    'ec_grid_upstream_requests_total': "Запити до ENTSO-E за набором даних і результатом",
+    'ec_grid_upstream_inflight': "Запити до ENTSO-E, що виконуються зараз",
+    'ec_grid_upstream_queued': "Запити в черзі губернатора за пріоритетом",
+    'ec_grid_upstream_tokens': "Доступні токени квоти ENTSO-E",
+    'ec_grid_upstream_circuit_open': "1 — circuit breaker відкритий або напіввідкритий",
+    'ec_grid_upstream_rejected_total': "Запити, відхилені circuit breaker",
+    'ec_grid_entsoe_http_seconds': "Чистий час HTTP-відповіді ENTSO-E (без розбору XML)",
+    'ec_grid_cache_requests_total': "Звернення до кешів за результатом (hit, miss, stale, coalesced)",
+    'ec_grid_http_request_seconds': "Тривалість HTTP-запитів API за маршрутом і статусом",
+    'ec_grid_stream_clients': "Підключені клієнти SSE",
+}
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_histograms = {}
+_collectors = []
+_trace = contextvars.ContextVar('ec_grid_trace', default=None)
+_exported_at = 0.0
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def add(name, amount, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _gauges[key] = _gauges.get(key, 0) + amount
+
+
+def observe(name, seconds, **labels):
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0]
+        i = 0
+        while i < len(BUCKETS) and seconds > BUCKETS[i]:
+            i += 1
+        hist[0][i] += 1
+        hist[1] += seconds
+
+
+def collector(fn):
+    """fn() -> [(тип, назва, мітки, значення)]; викликається при кожному зборі метрик."""
+    _collectors.append(fn)
+    return fn
+
+
+@contextmanager
+def trace():
+    """Збирає етапи поточного запиту (переходить у asyncio.to_thread і черги upstream)."""
+    entries = []
+    token = _trace.set(entries)
+    try:
+        yield entries
+    finally:
+        _trace.reset(token)
+
+
+@contextmanager
+def timed(stage, **labels):
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t
+        observe('ec_grid_stage_seconds', elapsed, stage=stage, **labels)
+        entries = _trace.get()
+        if entries is not None:
+            entries.append((stage, elapsed))
+
+
+def server_timing(entries, total=None):
+    """Значення заголовка Server-Timing: сумарний час і кількість викликів кожного етапу."""
+    stages = {}
+    for stage, elapsed in entries:
+        dur, n = stages.get(stage, (0.0, 0))
+        stages[stage] = (dur + elapsed, n + 1)
+    parts = [f'{stage};dur={dur * 1000:.1f};desc="{n}x"' for stage, (dur, n) in stages.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def snapshot():
+    samples = []
+    for fn in _collectors:
+        try: samples.extend(fn())
+        except Exception: pass
+    with _lock:
+        samples += [('counter', name, dict(labels), value) for (name, labels), value in _counters.items()]
+        samples += [('gauge', name, dict(labels), value) for (name, labels), value in _gauges.items()]
+        samples += [('histogram', name, dict(labels), [list(h[0]), h[1]]) for (name, labels), h in _histograms.items()]
+    return samples
+
+
+def export(process):
+    """Скидає знімок метрик процесу (дашборду) на диск для /metrics API; не частіше ніж раз на EXPORT_EVERY с."""
+    global _exported_at
+    now = time.monotonic()
+    if now - _exported_at < EXPORT_EVERY:
+        return
+    _exported_at = now
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    path = os.path.join(EXPORT_DIR, f"{process}-{os.getpid()}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f: json.dump(snapshot(), f)
+    os.replace(tmp, path)
+
+
+def _imported():
+    samples = []
+    for path in glob.glob(os.path.join(EXPORT_DIR, "*.json")):
+        process, _, pid = os.path.basename(path)[:-5].rpartition('-')
+        try:
+            if pid == str(os.getpid()) or time.time() - os.stat(path).st_mtime > EXPORT_MAX_AGE:
+                continue
+            with open(path) as f: exported = json.load(f)
+        except (OSError, ValueError):
+            continue
+        samples += [(kind, name, {**labels, 'process': process, 'pid': pid}, value) for kind, name, labels, value in exported]
+    return samples
+
+
+def _labels(labels, extra=None):
+    items = list(labels.items()) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escape = lambda v: str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in items) + "}"
+
+
+def render():
+    """Усі метрики у текстовому форматі Prometheus 0.0.4."""
+    groups = {}
+    for kind, name, labels, value in snapshot() + _imported():
+        groups.setdefault(name, (kind, []))[1].append((labels, value))
+    lines = []
+    for name in sorted(groups):
+        kind, samples = groups[name]
+        if name in HELP:
+            lines.append(f"# HELP {name} {HELP[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            if kind != 'histogram':
+                lines.append(f"{name}{_labels(labels)} {value}")
+                continue
+            counts, total = value
+            cumulative = 0
+            for le, count in zip(BUCKETS + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels, ('le', le))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
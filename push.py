@@ -0,0 +1,123 @@
+import asyncio
+import json
+import logging
+
+# --- PUSH-ПОТІК ЦІН (Server-Sent Events) ---
+# Клієнт підписується на зони й тримає одне HTTP-з'єднання замість опитування.
+# Один фоновий цикл на воркер перевіряє версії даних підписаних зон і, коли вони змінились,
+# рахує оновлення один раз на зону та розсилає його всім підписникам.
+# Повільний клієнт не накопичує черги: для кожної зони в нього лежить лише останнє
+# ще не відправлене оновлення (старіше просто замінюється), тож пам'ять обмежена кількістю зон.
+
+log = logging.getLogger(__name__)
+
+POLL_SECONDS = 5
+HEARTBEAT_SECONDS = 15
+RETRY_MS = 5000
+
+
+class Subscriber:
+    def __init__(self, zones):
+        self.zones = zones
+        self.pending = {}
+        self._event = asyncio.Event()
+
+    def push(self, zone, payload):
+        self.pending[zone] = payload
+        self._event.set()
+
+    async def updates(self, timeout):
+        """Чекає оновлень до timeout секунд; повертає {зона: payload} (порожній — час відправити heartbeat)."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return {}
+        self._event.clear()
+        pending, self.pending = self.pending, {}
+        return pending
+
+
+class Hub:
+    """version(zone) — дешевий ключ стану зони (синхронний); snapshot(zone) — корутина з оновленням."""
+
+    def __init__(self, version, snapshot, poll=POLL_SECONDS):
+        self.version = version
+        self.snapshot = snapshot
+        self.poll = poll
+        self._subs = {}
+        self._latest = {}
+        self._versions = {}
+        self._wake = asyncio.Event()
+        self.clients = 0
+
+    def subscribe(self, zones):
+        sub = Subscriber(zones)
+        self.clients += 1
+        for zone in zones:
+            self._subs.setdefault(zone, set()).add(sub)
+            if zone in self._latest:
+                sub.push(zone, self._latest[zone])
+        self._wake.set()
+        return sub
+
+    def unsubscribe(self, sub):
+        self.clients -= 1
+        for zone in sub.zones:
+            subs = self._subs.get(zone)
+            if subs is None:
+                continue
+            subs.discard(sub)
+            if not subs:
+                # Зону ніхто не слухає: перестаємо її відстежувати
+                del self._subs[zone]
+                self._latest.pop(zone, None)
+                self._versions.pop(zone, None)
+
+    def stats(self):
+        return {"clients": self.clients, "zones": len(self._subs),
+                "subscriptions": sum(len(s) for s in self._subs.values())}
+
+    async def _update(self, zone):
+        version = self.version(zone)
+        if self._versions.get(zone) == version:
+            return
+        try:
+            payload = await self.snapshot(zone)
+        except Exception as e:
+            # Помилку теж розсилаємо (один раз на версію), наступна спроба — коли зміниться версія
+            log.warning("stream snapshot %s failed: %s", zone, e)
+            payload = {"zone": zone, "status": "error", "detail": str(e)}
+        if zone not in self._subs:
+            return
+        self._versions[zone] = version
+        self._latest[zone] = payload
+        for sub in list(self._subs.get(zone, ())):
+            sub.push(zone, payload)
+
+    async def run(self):
+        while True:
+            self._wake.clear()
+            await asyncio.gather(*(self._update(zone) for zone in list(self._subs)))
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll)
+            except asyncio.TimeoutError:
+                pass
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def event_stream(hub, zones, heartbeat=HEARTBEAT_SECONDS):
+    """Генератор SSE для StreamingResponse; після відключення клієнта підписка знімається."""
+    sub = hub.subscribe(zones)
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        while True:
+            updates = await sub.updates(heartbeat)
+            if not updates:
+                yield ": ping\n\n"
+                continue
+            yield "".join(sse("price", payload) for payload in updates.values())
+    finally:
+        hub.unsubscribe(sub)
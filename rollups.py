@@ -0,0 +1,359 @@
+import os
+import threading
+import time
+import warnings
+from collections import defaultdict
+from datetime import date, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+import analytics
+import upstream
+from daycache import day_cache, is_settled
+from store import DATA_DIR, TZ, store, atomic_write
+
+# --- ДОБОВІ ЗВЕДЕННЯ (ROLLUPS) ---
+# Для кожної зони й доби зберігаємо зведення цін, навантаження, небалансів і міксу генерації:
+# кількість, суму, мін, макс, квантильний скетч і профіль за годинами доби.
+# Довгі порівняння ("середнє за 30 днів", "перцентиль сьогоднішньої ціни за рік",
+# "той самий день тижня рік тому") рахуються зі зведень, без сирих 15-хв даних за місяці.
+# Зведення оновлюються, коли сховище отримує нові дані, а минулі доби дозавантажує планувальник
+# (backfill) через кеш діб. Файли — помісячні parquet у DATA_DIR/rollups/<зона>/<РРРР-ММ>.parquet.
+
+ROLLUP_DAYS = int(os.environ.get("EC_GRID_ROLLUP_DAYS", "366"))
+BACKFILL_DAYS = int(os.environ.get("EC_GRID_ROLLUP_BACKFILL_DAYS", "4"))
+# Неврегульовані доби перераховуються не частіше ніж раз на REINGEST_AFTER секунд
+REINGEST_AFTER = 6 * 3600
+WINDOW_DAYS = 30
+SAME_WEEKDAY = timedelta(days=364)
+
+# Скетч у стилі DDSketch: логарифмічні кошики з відносною похибкою SKETCH_ALPHA, окремо для
+# додатних і від'ємних значень (ціни й небаланси бувають від'ємними); |x| < SKETCH_MIN — нульовий кошик.
+# Скетчі діб складаються простим додаванням лічильників
+SKETCH_ALPHA = 0.01
+SKETCH_MIN = 0.01
+SKETCH_MAX = 1e6
+_GAMMA = (1 + SKETCH_ALPHA) / (1 - SKETCH_ALPHA)
+_LOG_GAMMA = np.log(_GAMMA)
+_HALF = int(np.ceil(np.log(SKETCH_MAX / SKETCH_MIN) / _LOG_GAMMA))
+SKETCH_SIZE = 2 * _HALF + 1
+
+# Набір даних ENTSO-E -> метрики зведень
+METRICS = {'prices': 'price', 'load': 'load', 'imb_p': 'imb_price', 'imb_v': 'imb_volume', 'gen': 'res_share'}
+_MARKER = '_day'
+_HOURS_FIELDS = 4  # кількість, сума, мін, макс
+
+
+def _bucket(values):
+    values = np.asarray(values, dtype=float)
+    k = np.ceil(np.log(np.maximum(np.abs(values), SKETCH_MIN) / SKETCH_MIN) / _LOG_GAMMA)
+    return (_HALF + np.sign(values) * np.clip(k, 0, _HALF)).astype(np.int64)
+
+
+def _bucket_value(i):
+    k = abs(i - _HALF)
+    return 0.0 if k == 0 else float(np.sign(i - _HALF) * SKETCH_MIN * 2 * _GAMMA ** k / (_GAMMA + 1))
+
+
+def sketch(values):
+    """Розріджений скетч: (номери кошиків, лічильники)."""
+    idx, counts = np.unique(_bucket(values), return_counts=True)
+    return idx.astype(np.int16), counts.astype(np.int32)
+
+
+def merge(sketches):
+    sketches = list(sketches)
+    if not sketches:
+        return np.zeros(SKETCH_SIZE)
+    return np.bincount(np.concatenate([s[0] for s in sketches]).astype(np.int64),
+                       weights=np.concatenate([s[1] for s in sketches]), minlength=SKETCH_SIZE)
+
+
+def quantile(dense, q):
+    total = dense.sum()
+    if not total:
+        return None
+    return _bucket_value(int(np.searchsorted(np.cumsum(dense), q * (total - 1), side='right')))
+
+
+def rank(dense, value):
+    """Перцентиль значення серед значень скетча (0..100)."""
+    total = dense.sum()
+    if not total:
+        return None
+    i = int(_bucket(value))
+    return float((dense[:i].sum() + dense[i] / 2) / total * 100)
+
+
+def _series(dataset, frame):
+    # Ряди метрик із набору даних; генерація — частка ВДЕ та окремі джерела ('gen:<назва>')
+    values = frame.to_numpy(dtype=float).reshape(len(frame), -1)
+    if dataset == 'imb_p':
+        # Подвійні ціни (Long/Short) усереднюються; для єдиної ціни це сама ціна
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return {'imb_price': np.nanmean(values, axis=1)}
+    if dataset != 'gen':
+        return {METRICS[dataset]: values[:, 0]}
+    g = np.nan_to_num(values)
+    green, _ = analytics.green_columns(tuple(frame.columns))
+    total = g.sum(axis=1)
+    with np.errstate(all='ignore'):
+        share = np.where(total > 0, g[:, green].sum(axis=1) / total * 100, np.nan)
+    return {'res_share': share, **{f'gen:{c}': g[:, i] for i, c in enumerate(frame.columns)}}
+
+
+def _roll(values, hours):
+    ok = ~np.isnan(values)
+    v, h = values[ok], hours[ok]
+    if not len(v):
+        return None
+    hourly = np.full((_HOURS_FIELDS, 24), np.nan)
+    hourly[0] = np.bincount(h, minlength=24)
+    hourly[1] = np.bincount(h, weights=v, minlength=24)
+    np.fmin.at(hourly[2], h, v)
+    np.fmax.at(hourly[3], h, v)
+    return {'count': int(len(v)), 'sum': float(v.sum()), 'min': float(v.min()), 'max': float(v.max()),
+            'sketch': sketch(v), 'hours': hourly}
+
+
+@lru_cache(maxsize=256)
+def _day_keys(start, end):
+    first, last = date.fromisoformat(start), date.fromisoformat(end)
+    return tuple((first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1))
+
+
+def _days(start, end):
+    return _day_keys(start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+
+
+class RollupStore:
+    """Зведення в пам'яті процесу з помісячними файлами; інший процес бачить зміни за mtime файлів."""
+
+    def __init__(self, root=os.path.join(DATA_DIR, 'rollups')):
+        self.root = root
+        self._lock = threading.RLock()
+        self._rows = defaultdict(dict)
+        self._mtimes = {}
+
+    def _path(self, zone, month):
+        return os.path.join(self.root, zone, f"{month}.parquet")
+
+    def _load(self, zone):
+        try: names = os.listdir(os.path.join(self.root, zone))
+        except OSError: return
+        for name in names:
+            if not name.endswith('.parquet'):
+                continue
+            month = name[:-8]
+            try: mtime = os.stat(self._path(zone, month)).st_mtime_ns
+            except OSError: continue
+            if self._mtimes.get((zone, month)) == mtime:
+                continue
+            try: frame = pd.read_parquet(self._path(zone, month))
+            except (OSError, ValueError): continue
+            rows = self._rows[zone]
+            for key in [k for k in rows if k[1].startswith(month)]:
+                del rows[key]
+            for r in frame.itertuples(index=False):
+                rows[(r.metric, r.day)] = {
+                    'count': r.count, 'sum': r.sum, 'min': r.min, 'max': r.max, 'final': r.final, 'at': r.at,
+                    'sketch': (np.frombuffer(r.sk_idx, np.int16), np.frombuffer(r.sk_cnt, np.int32)),
+                    'hours': np.frombuffer(r.hours, float).reshape(_HOURS_FIELDS, 24)}
+            self._mtimes[(zone, month)] = mtime
+
+    def _save(self, zone, month):
+        rows = sorted((k, r) for k, r in self._rows[zone].items() if k[1].startswith(month))
+        frame = pd.DataFrame({
+            'metric': [k[0] for k, _ in rows], 'day': [k[1] for k, _ in rows],
+            'count': [r['count'] for _, r in rows], 'sum': [r['sum'] for _, r in rows],
+            'min': [r['min'] for _, r in rows], 'max': [r['max'] for _, r in rows],
+            'final': [r['final'] for _, r in rows], 'at': [r['at'] for _, r in rows],
+            'sk_idx': [r['sketch'][0].tobytes() for _, r in rows], 'sk_cnt': [r['sketch'][1].tobytes() for _, r in rows],
+            'hours': [r['hours'].tobytes() for _, r in rows]})
+        path = self._path(zone, month)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write(path, lambda tmp: frame.to_parquet(tmp, index=False))
+        self._mtimes[(zone, month)] = os.stat(path).st_mtime_ns
+
+    def _ingest(self, zone, dataset, frame, days, final):
+        # Повертає місяці, зведення яких змінились (виклик під self._lock)
+        if frame is None or frame.empty or dataset not in METRICS:
+            return set()
+        now = time.time()
+        months = set()
+        for day in days:
+            day = day.normalize()
+            # DateOffset — календарна доба: у дні переходу на літній/зимовий час вона триває 23/25 год
+            part = frame.loc[day:day + pd.DateOffset(days=1) - timedelta(microseconds=1)]
+            if part.empty:
+                continue
+            hours = np.asarray(part.index.hour)
+            key = day.strftime('%Y-%m-%d')
+            for metric, values in _series(dataset, part).items():
+                row = _roll(values, hours)
+                if row is not None:
+                    self._rows[zone][(metric, key)] = {**row, 'final': final, 'at': now}
+            months.add(key[:7])
+        return months
+
+    def ingest(self, zone, dataset, frame, days, final=False):
+        """Перераховує зведення набору даних за вказані доби (frame має містити ці доби повністю)."""
+        with self._lock:
+            self._load(zone)
+            for month in self._ingest(zone, dataset, frame, days, final):
+                self._save(zone, month)
+
+    def ingest_day(self, zone, day, data):
+        """Зведення повної доби з кешу діб ({набір: дані}); позначка _day — доба вже опрацьована."""
+        final = is_settled(day)
+        key = day.normalize().strftime('%Y-%m-%d')
+        with self._lock:
+            self._load(zone)
+            for ds, frame in data.items():
+                self._ingest(zone, ds, frame, [day], final)
+            self._rows[zone][(_MARKER, key)] = {'count': 0, 'sum': 0.0, 'min': np.nan, 'max': np.nan, 'final': final,
+                                                'at': time.time(), 'sketch': sketch([]),
+                                                'hours': np.full((_HOURS_FIELDS, 24), np.nan)}
+            self._save(zone, key[:7])
+
+    def on_store_update(self, zone, dataset, frame, days):
+        # Слухач сховища живих даних: доби, що повністю є у фреймі (сьогодні — поки неповна)
+        if frame is None or frame.empty:
+            return
+        self.ingest(zone, dataset, frame, [d for d in days if frame.index[0] <= d], final=False)
+
+    def missing(self, zone, now, days=ROLLUP_DAYS):
+        """Минулі доби без зведень (спершу найновіші) та неврегульовані, які давно не перераховувались."""
+        with self._lock:
+            self._load(zone)
+            rows = self._rows[zone]
+            result = []
+            for key in reversed(_days(now - timedelta(days=days), now - timedelta(days=1))):
+                row = rows.get((_MARKER, key))
+                if row is None or (not row['final'] and time.time() - row['at'] > REINGEST_AFTER):
+                    result.append(pd.Timestamp(key, tz=TZ))
+            return result
+
+    def backfill(self, api_key, zone, now, limit=BACKFILL_DAYS, priority=upstream.HISTORY):
+        """Дозавантажує до limit діб через кеш діб; повертає кількість опрацьованих діб."""
+        days = self.missing(zone, now)[:limit]
+        if not days:
+            return 0
+        loaded = day_cache.get_many(api_key, zone, days, max_age=REINGEST_AFTER, priority=priority)
+        for day in days:
+            data = loaded[day.normalize()]
+            # Помилка ENTSO-E (а не "немає даних") — добу спробуємо наступного разу: у кеші діб
+            # мають бути файли (дані або підтверджена відсутність) для всіх наборів
+            if all(day_cache.version(zone, day, [ds])[1][0] for ds in data):
+                self.ingest_day(zone, day, data)
+        return len(days)
+
+    def version(self, zone):
+        with self._lock:
+            self._load(zone)
+            return max((m for (z, _), m in self._mtimes.items() if z == zone), default=0)
+
+    # --- ЗАПИТИ ---
+    def _select(self, zone, metric, start, end):
+        with self._lock:
+            self._load(zone)
+            rows = self._rows[zone]
+            return [rows[(metric, d)] for d in _days(start, end) if (metric, d) in rows]
+
+    def window(self, zone, metric, start, end, quantiles=(0.05, 0.5, 0.95)):
+        """Зведення метрики за доби [start, end]: середнє, мін, макс і квантилі зі скетчів."""
+        rows = self._select(zone, metric, start, end)
+        if not rows:
+            return None
+        count = sum(r['count'] for r in rows)
+        dense = merge(r['sketch'] for r in rows)
+        total = float(sum(r['sum'] for r in rows))
+        return {'days': len(rows), 'count': int(count), 'sum': total, 'avg': total / count,
+                'min': float(min(r['min'] for r in rows)), 'max': float(max(r['max'] for r in rows)),
+                **{f"p{round(q * 100):02d}": quantile(dense, q) for q in quantiles}}
+
+    def percentile(self, zone, metric, value, start, end):
+        """Який відсоток значень метрики за доби [start, end] менший за value."""
+        if value is None:
+            return None
+        return rank(merge(r['sketch'] for r in self._select(zone, metric, start, end)), value)
+
+    def profile(self, zone, metric, start, end):
+        """Середнє за кожну годину доби (0..23) за доби [start, end]."""
+        rows = self._select(zone, metric, start, end)
+        if not rows:
+            return None
+        hours = np.nansum([r['hours'][:2] for r in rows], axis=0)
+        with np.errstate(all='ignore'):
+            return (hours[1] / hours[0]).tolist()
+
+    def fuels(self, zone):
+        with self._lock:
+            self._load(zone)
+            return sorted({m[4:] for m, _ in self._rows[zone] if m.startswith('gen:')})
+
+    def period_kpis(self, zone, start, end):
+        """Показники за доби [start, end] у форматі analytics.period_kpis (обсяги — в середньому за добу)."""
+        key = ('rollup', 'kpis', zone, self.version(zone), start.normalize(), end.normalize())
+        return analytics.memoized(key, lambda: self._period_kpis(zone, start, end))
+
+    def _period_kpis(self, zone, start, end):
+        price, load = self.window(zone, 'price', start, end), self.window(zone, 'load', start, end)
+        imb_p, imb_v = self.window(zone, 'imb_price', start, end), self.window(zone, 'imb_volume', start, end)
+        kpis = {'price': None, 'market': None, 'res': None, 'imbalance': None}
+        if price:
+            kpis['price'] = {'min': price['min'], 'max': price['max'], 'avg': price['avg'],
+                             'raw_max': price['max'], 'raw_avg': price['avg']}
+            kpis['market'] = {'volume_gwh': load['sum'] / load['days'] / 1000 if load else 0.0, 'turnover_meur': None}
+        fuels = self.fuels(zone)
+        sums = {f: self._select(zone, f'gen:{f}', start, end) for f in fuels}
+        days = max((len(rows) for rows in sums.values()), default=0)
+        if days:
+            totals = np.array([sum(r['sum'] for r in sums[f]) for f in fuels]) / days
+            green, mix = analytics.green_columns(tuple(fuels))
+            green_mw = float(totals[green].sum())
+            total_mw = float(totals.sum())
+            kpis['res'] = {
+                'share_pct': green_mw / total_mw * 100 if total_mw > 0 else 0.0,
+                'green_gwh': green_mw / 1000,
+                'value_meur': green_mw * (price['avg'] if price else 0.0) / 1000000,
+                **{f'{k}_pct': (float(totals[cols].sum()) / green_mw * 100 if green_mw else 0.0) for k, cols in mix.items()},
+            }
+        if imb_p or imb_v:
+            kpis['imbalance'] = {'price_max': imb_p['max'] if imb_p else 0.0, 'price_min': imb_p['min'] if imb_p else 0.0,
+                                 'price_avg': imb_p['avg'] if imb_p else 0.0,
+                                 'surplus_max_mw': imb_v['max'] if imb_v else 0.0,
+                                 'deficit_max_mw': imb_v['min'] if imb_v else 0.0}
+        return kpis
+
+    def summary(self, zone, now, days=WINDOW_DAYS, metrics=None, profile=False):
+        """Довгі порівняння для API та дашборду за кожною метрикою: сьогодні, вікно days діб, рік,
+        перцентиль сьогоднішнього середнього за рік і той самий день тижня рік тому."""
+        key = ('rollup', 'summary', zone, self.version(zone), now.normalize(), days, tuple(metrics or ()), profile)
+        return analytics.memoized(key, lambda: self._summary(zone, now, days, metrics, profile))
+
+    def _summary(self, zone, now, days, metrics, profile):
+        today, yesterday = now.normalize(), now.normalize() - timedelta(days=1)
+        year_start = today - timedelta(days=365)
+        result = {}
+        for metric in metrics or METRICS.values():
+            day = self.window(zone, metric, today, today, ())
+            year = self.window(zone, metric, year_start, yesterday)
+            same = today - SAME_WEEKDAY
+            result[metric] = {
+                'today': day,
+                'window': self.window(zone, metric, today - timedelta(days=days), yesterday),
+                'year': year,
+                'today_percentile': self.percentile(zone, metric, day and day['avg'], year_start, yesterday),
+                'same_weekday_last_year': {'date': same.strftime('%Y-%m-%d'), **(self.window(zone, metric, same, same, ()) or {})},
+            }
+            if profile:
+                result[metric]['profile'] = self.profile(zone, metric, today - timedelta(days=days), yesterday)
+        return result
+
+
+rollups = RollupStore()
+store.listeners.append(rollups.on_store_update)
@@ -0,0 +1,147 @@
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+import pandas as pd
+
+import upstream
+from daycache import day_cache
+from rollups import rollups
+from store import DATA_DIR, TZ, store, live_window
+from zones import COUNTRY_INFO
+
+try:
+    import fcntl
+except ImportError:  # Windows: без міжпроцесного блокування
+    fcntl = None
+
+# --- ФОНОВИЙ ПЛАНУВАЛЬНИК ---
+# Тримає всі зони COUNTRY_INFO "теплими": користувацькі шляхи (API та дашборд) лише читають
+# сховище, а до ENTSO-E звертається тільки цей потік. Якщо API і дашборд запущені окремими
+# процесами, планувальник працює лише в одному з них (файлове блокування в DATA_DIR).
+
+log = logging.getLogger(__name__)
+
+# Ліміт ENTSO-E — 400 запитів/хв на користувача; квоту стереже governor, а тут фонові завдання
+# ще й рівномірно розподіляються, щоб не забирати в користувачів усі токени одразу
+RATE_PER_MINUTE = int(os.environ.get("ENTSOE_RATE_PER_MINUTE", "120"))
+SPACING = 60 / RATE_PER_MINUTE
+
+# Результати РДН (SDAC) публікуються близько 12:45 CET = 13:45 за Києвом
+DAM_PUBLICATION = (pd.Timedelta(hours=13, minutes=30), pd.Timedelta(hours=15, minutes=30))
+DAM_POLL = timedelta(minutes=5)
+PRICES_EVERY = timedelta(minutes=30)
+# Фактичні дані й небаланси виходять після завершення 15-хв інтервалу врегулювання
+SETTLEMENT_LAG = timedelta(minutes=5)
+HISTORY_EVERY = 3600
+# Дозавантаження добових зведень за минулий рік — кілька діб на зону за прохід
+ROLLUP_EVERY = 900
+
+# Якщо планувальник з якоїсь причини не встиг, користувацький шлях сам дотягне дані,
+# старші за ці пороги (секунди)
+USER_MAX_AGE = 3600
+USER_HISTORY_MAX_AGE = 2 * HISTORY_EVERY
+
+
+def next_run(zone, dataset, now):
+    if dataset == 'prices':
+        tomorrow = now.normalize() + pd.DateOffset(days=1)
+        since_midnight = now - now.normalize()
+        waiting = store.read(zone, 'prices', tomorrow) is None
+        if waiting and DAM_PUBLICATION[0] <= since_midnight < DAM_PUBLICATION[1]:
+            return now + DAM_POLL
+        return now + PRICES_EVERY
+    return now.floor('15min') + timedelta(minutes=15) + SETTLEMENT_LAG
+
+
+def history_days(now):
+    return [now - timedelta(days=1), now - timedelta(days=365)]
+
+
+class Scheduler(threading.Thread):
+    def __init__(self, api_key, zones=None):
+        super().__init__(name="entsoe-prefetch", daemon=True)
+        self.api_key = api_key
+        self.zones = zones or [i['zone'] for i in COUNTRY_INFO.values()]
+        self._stopped = threading.Event()
+        self._lock_file = None
+
+    def _acquire_leadership(self):
+        if fcntl is None:
+            return True
+        os.makedirs(DATA_DIR, exist_ok=True)
+        f = open(os.path.join(DATA_DIR, 'scheduler.lock'), 'w')
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._lock_file = f
+        return True
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        while not self._acquire_leadership():
+            if self._stopped.wait(60):
+                return
+        try:
+            self._loop()
+        finally:
+            # Звільняємо блокування: планувальник може перейняти інший процес
+            if self._lock_file:
+                self._lock_file.close()
+                self._lock_file = None
+
+    def _loop(self):
+        log.info("prefetch scheduler started for %s", self.zones)
+        due = {(zone, ds): 0.0 for ds in upstream.DATASETS for zone in self.zones}
+        due.update({(zone, 'history'): 0.0 for zone in self.zones})
+        due.update({(zone, 'rollup'): 0.0 for zone in self.zones})
+        while not self._stopped.is_set():
+            key, when = min(due.items(), key=lambda kv: kv[1])
+            if when > time.time():
+                self._stopped.wait(min(when - time.time(), 30))
+                continue
+            zone, job = key
+            now = pd.Timestamp.now(tz=TZ)
+            try:
+                if job == 'history':
+                    day_cache.get_many(self.api_key, zone, history_days(now), max_age=HISTORY_EVERY, priority=upstream.HISTORY)
+                    due[key] = time.time() + HISTORY_EVERY
+                elif job == 'rollup':
+                    rollups.backfill(self.api_key, zone, now)
+                    due[key] = time.time() + ROLLUP_EVERY
+                else:
+                    store.refresh(self.api_key, zone, *live_window(now), [job], priority=upstream.LIVE)
+                    due[key] = next_run(zone, job, now).timestamp()
+            except Exception:
+                log.exception("prefetch %s/%s failed", zone, job)
+                due[key] = time.time() + 60
+            self._stopped.wait(SPACING)
+
+
+_instance = None
+_instance_lock = threading.Lock()
+
+
+def start(api_key):
+    """Запускає планувальник один раз на процес (повторні виклики нічого не роблять)."""
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            _instance = Scheduler(api_key)
+            _instance.start()
+        return _instance
+
+
+def stop():
+    """Зупиняє планувальник процесу (при завершенні застосунку); start() потім запустить новий."""
+    global _instance
+    with _instance_lock:
+        if _instance is not None:
+            _instance.stop()
+            _instance = None
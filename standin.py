@@ -0,0 +1,309 @@
+import argparse
+import io
+import math
+import os
+import random
+import re
+import time
+import zipfile
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+# --- ОФЛАЙН-ЗАМІННИК ENTSO-E ---
+# Транспортний адаптер для спільної сесії upstream: запити до ENTSO-E отримують записані
+# XML-відповіді (або zip для небалансів) з каталогу фікстур, зсунуті на цілу кількість діб
+# під запитане вікно. Фактичні дані обрізаються поточним моментом, як у справжнього сервісу.
+# Затримка та помилки (503/429/таймаут) додаються штучно — для вимірювань і перевірки губернатора.
+#
+#   python standin.py record --days 7   # записати фікстури зі справжнього ENTSO-E (потрібен entsoe_key)
+#   python standin.py synth --days 7    # згенерувати синтетичні фікстури того самого формату
+#   ENTSOE_STANDIN=.data/fixtures uvicorn main:app   # запуск API/дашборду без ENTSO-E
+
+FIXTURES_DIR = os.path.join(os.environ.get("EC_GRID_DATA_DIR", ".data"), "fixtures")
+DOMAIN_PARAMS = ('in_Domain', 'outBiddingZone_Domain', 'controlArea_Domain', 'out_Domain')
+# Документи з майбутніми даними (РДН публікується на добу вперед) не обрізаються поточним моментом
+FORWARD_DOCUMENTS = ('A44',)
+
+TS_RE = re.compile(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}(?::\d{2})?Z')
+SERIES_RE = re.compile(r'<TimeSeries>.*?</TimeSeries>', re.S)
+PERIOD_RE = re.compile(r'<Period>.*?</Period>', re.S)
+POINT_RE = re.compile(r'<Point>\s*<position>(\d+)</position>.*?</Point>\s*', re.S)
+RESOLUTION = {'PT15M': pd.Timedelta(minutes=15), 'PT30M': pd.Timedelta(minutes=30), 'PT60M': pd.Timedelta(hours=1)}
+
+NO_DATA = ("<?xml version=\"1.0\" encoding=\"UTF-8\"?><Acknowledgement_MarketDocument><Reason><code>999</code>"
+           "<text>No matching data found for Data item (stand-in)</text></Reason></Acknowledgement_MarketDocument>")
+
+
+def fixture_key(params):
+    """Ім'я фікстури за параметрами запиту: тип документа, процес і зона (без дат і токена)."""
+    domain = next((params[p] for p in DOMAIN_PARAMS if p in params), 'any')
+    return f"{params.get('documentType', 'doc')}_{params.get('processType', 'x')}_{domain}"
+
+
+def _params(request):
+    return {k: v[0] for k, v in parse_qs(urlparse(request.url).query).items()}
+
+
+def _stamp(ts):
+    return ts.strftime('%Y-%m-%dT%H:%MZ')
+
+
+def _shift(text, delta):
+    return TS_RE.sub(lambda m: _stamp(pd.Timestamp(m.group()) + delta), text)
+
+
+def _clip(period, until):
+    # Прибирає точки після until (зсув позицій не потрібен: обрізається лише хвіст періоду);
+    # період без точок зникає повністю
+    start = pd.Timestamp(TS_RE.search(period).group())
+    step = RESOLUTION[re.search(r'<resolution>(\w+)</resolution>', period).group(1)]
+    keep = max(int((until - start) / step), 0)
+    period = POINT_RE.sub(lambda p: p.group() if int(p.group(1)) <= keep else '', period)
+    period = re.sub(r'(<timeInterval>\s*<start>[^<]+</start>\s*<end>)[^<]+(</end>)',
+                    lambda e: e.group(1) + _stamp(start + keep * step) + e.group(2), period)
+    return period if '<Point>' in period else ''
+
+
+def retime(xml, start, end, until=None):
+    """Зсуває записаний документ на цілу кількість діб так, щоб він покривав [start, end).
+
+    Коротший за вікно запис повторюється додатковими <Period> усередині тих самих <TimeSeries>
+    (копії цілих TimeSeries entsoe-py не розбирає для небалансів); until — обрізати точки,
+    пізніші за цей момент.
+    """
+    blocks = SERIES_RE.findall(xml)
+    if not blocks:
+        return xml
+    stamps = [pd.Timestamp(t) for b in blocks for t in TS_RE.findall(b)]
+    rec_start = min(stamps).floor('D')
+    span = pd.Timedelta(days=max(math.ceil((max(stamps) - rec_start) / pd.Timedelta(days=1)), 1))
+    first = start.floor('D') - rec_start
+    copies = max(math.ceil((end - start.floor('D')) / span), 1)
+    body = []
+    for block in blocks:
+        periods = PERIOD_RE.findall(block)
+        if not periods:
+            continue
+        shifted = [_shift(p, first + k * span) for k in range(copies) for p in periods]
+        if until is not None:
+            shifted = [_clip(p, until) for p in shifted]
+        if any(shifted):
+            head = block[:block.index(periods[0])]
+            tail = block[block.rindex(periods[-1]) + len(periods[-1]):]
+            body.append(_shift(head, first) + ''.join(shifted) + tail)
+    head = xml[:xml.index(blocks[0])]
+    tail = xml[xml.rindex(blocks[-1]) + len(blocks[-1]):]
+    return head + ''.join(body) + tail
+
+
+def _response(request, status, content, content_type, headers=None):
+    resp = requests.Response()
+    resp.status_code = status
+    resp._content = content
+    resp.headers['Content-Type'] = content_type
+    resp.headers.update(headers or {})
+    resp.url = request.url
+    resp.request = request
+    resp.encoding = 'utf-8'
+    return resp
+
+
+class ReplayAdapter(BaseAdapter):
+    """Відповідає на запити до ENTSO-E записаними фікстурами.
+
+    latency — середня затримка відповіді (с, ±50%); error_rate — частка відповідей 503,
+    throttle_rate — 429 з Retry-After, timeout_rate — таймаут читання.
+    """
+
+    def __init__(self, root=FIXTURES_DIR, latency=0.0, error_rate=0.0, throttle_rate=0.0, timeout_rate=0.0, seed=None):
+        super().__init__()
+        self.root = root
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.timeout_rate = timeout_rate
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._files = {}
+
+    def _fixture(self, key):
+        if key not in self._files:
+            self._files[key] = None
+            for ext in ('zip', 'xml'):
+                path = os.path.join(self.root, f"{key}.{ext}")
+                if os.path.exists(path):
+                    with open(path, 'rb') as f: self._files[key] = (ext, f.read())
+                    break
+        return self._files[key]
+
+    def send(self, request, timeout=None, **kwargs):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency * self._random.uniform(0.5, 1.5))
+        roll = self._random.random()
+        if roll < self.timeout_rate:
+            raise requests.ReadTimeout("stand-in: read timed out", request=request)
+        roll -= self.timeout_rate
+        if roll < self.error_rate:
+            return _response(request, 503, b"<html>Service Unavailable</html>", 'text/html')
+        roll -= self.error_rate
+        if roll < self.throttle_rate:
+            return _response(request, 429, b"<html>Too Many Requests</html>", 'text/html', {'Retry-After': '5'})
+
+        params = _params(request)
+        fixture = self._fixture(fixture_key(params))
+        # Посторінкові запити (offset): увесь запис уміщується на першій сторінці
+        if fixture is None or int(params.get('offset', 0)) > 0:
+            return _response(request, 200, NO_DATA.encode(), 'text/xml')
+        start = pd.Timestamp(params['periodStart'], tz='UTC')
+        end = pd.Timestamp(params['periodEnd'], tz='UTC')
+        until = None if params.get('documentType') in FORWARD_DOCUMENTS else pd.Timestamp.now(tz='UTC')
+        ext, content = fixture
+        if ext == 'xml':
+            return _response(request, 200, retime(content.decode(), start, end, until).encode(), 'text/xml')
+        out = io.BytesIO()
+        with zipfile.ZipFile(io.BytesIO(content)) as src, zipfile.ZipFile(out, 'w') as dst:
+            for name in src.namelist():
+                dst.writestr(name, retime(src.read(name).decode(), start, end, until))
+        return _response(request, 200, out.getvalue(), 'application/zip')
+
+    def close(self):
+        pass
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Звичайний HTTPS-адаптер, що зберігає вдалі відповіді ENTSO-E як фікстури."""
+
+    def __init__(self, root=FIXTURES_DIR, **kwargs):
+        super().__init__(**kwargs)
+        self.root = root
+
+    def send(self, request, **kwargs):
+        resp = super().send(request, **kwargs)
+        if resp.status_code == 200 and b'No matching data found' not in resp.content[:2000]:
+            os.makedirs(self.root, exist_ok=True)
+            ext = 'zip' if resp.content[:2] == b'PK' else 'xml'
+            with open(os.path.join(self.root, f"{fixture_key(_params(request))}.{ext}"), 'wb') as f:
+                f.write(resp.content)
+        return resp
+
+
+def install(session, adapter):
+    """Підміняє транспорт сесії для всіх запитів до ENTSO-E."""
+    session.mount("https://web-api.tp.entsoe.eu/", adapter)
+    return adapter
+
+
+def uninstall(session):
+    session.adapters.pop("https://web-api.tp.entsoe.eu/", None)
+
+
+def from_env(session):
+    # ENTSOE_STANDIN=<каталог фікстур> вмикає заміну, ENTSOE_RECORD=<каталог> — запис
+    if os.environ.get("ENTSOE_STANDIN"):
+        return install(session, ReplayAdapter(
+            os.environ["ENTSOE_STANDIN"],
+            latency=float(os.environ.get("ENTSOE_STANDIN_LATENCY", "0")),
+            error_rate=float(os.environ.get("ENTSOE_STANDIN_ERROR_RATE", "0")),
+            throttle_rate=float(os.environ.get("ENTSOE_STANDIN_THROTTLE_RATE", "0")),
+            timeout_rate=float(os.environ.get("ENTSOE_STANDIN_TIMEOUT_RATE", "0"))))
+    if os.environ.get("ENTSOE_RECORD"):
+        return install(session, RecordingAdapter(os.environ["ENTSOE_RECORD"]))
+    return None
+
+
+# --- СИНТЕТИЧНІ ФІКСТУРИ ---
+# Документи у форматі ENTSO-E (ті самі елементи, що читають парсери entsoe-py) з правдоподібною
+# добовою формою: ціни з ранковим і вечірнім піками, сонце вдень, шум. Детерміновані за зоною.
+
+PSR_MW = {'B16': 2500, 'B19': 1800, 'B14': 7000, 'B05': 1500, 'B11': 900, 'B01': 300, 'B04': 1200, 'B10': 600}
+
+
+def _document(root_tag, series):
+    return f'<?xml version="1.0" encoding="UTF-8"?><{root_tag}>{"".join(series)}</{root_tag}>'
+
+
+def _series(start, values, label, extra='', step='PT15M', extra_point=None):
+    n = len(values)
+    end = start + n * RESOLUTION[step]
+    points = ''.join(f"<Point><position>{i + 1}</position><{label}>{v:.2f}</{label}>"
+                     f"{extra_point(i) if extra_point else ''}</Point>" for i, v in enumerate(values))
+    return (f"<TimeSeries>{extra}<curveType>A01</curveType><Period><timeInterval><start>{_stamp(start)}</start>"
+            f"<end>{_stamp(end)}</end></timeInterval><resolution>{step}</resolution>{points}</Period></TimeSeries>")
+
+
+def synthesize(root=FIXTURES_DIR, zones=None, days=7, start=None):
+    """Записує синтетичні фікстури для всіх наборів даних кожної зони; повертає кількість файлів."""
+    from entsoe.mappings import lookup_area
+    from zones import COUNTRY_INFO
+    zones = zones or [i['zone'] for i in COUNTRY_INFO.values()]
+    start = (start or pd.Timestamp.now(tz='UTC')).floor('D') - pd.Timedelta(days=days - 1)
+    os.makedirs(root, exist_ok=True)
+    written = 0
+    for name in zones:
+        # У запитах entsoe-py зона передається EIC-кодом
+        zone = lookup_area(name).code
+        rng = np.random.default_rng(sum(map(ord, zone)))
+        n = days * 96
+        hour = (np.arange(n) % 96) / 4
+        daily = np.sin((hour - 6) / 24 * 2 * np.pi)
+        peaks = np.exp(-((hour - 8) ** 2) / 4) + 1.3 * np.exp(-((hour - 19) ** 2) / 5)
+        solar = np.clip(np.sin((hour - 6) / 14 * np.pi), 0, None)
+        level = rng.uniform(60, 120)
+        docs = {
+            ('A44', 'x', zone): _document('Publication_MarketDocument', [_series(
+                start, level + 40 * peaks - 30 * solar + rng.normal(0, 8, n), 'price.amount')]),
+            ('A65', 'A16', zone): _document('GL_MarketDocument', [_series(
+                start, 12000 + 3000 * daily + 2000 * peaks + rng.normal(0, 300, n), 'quantity')]),
+            ('A75', 'A16', zone): _document('GL_MarketDocument', [_series(
+                start, np.clip(mw * (solar if psr == 'B16' else 0.6 + 0.4 * rng.random(n)), 0, None), 'quantity',
+                f"<inBiddingZone_Domain.mRID>{zone}</inBiddingZone_Domain.mRID><MktPSRType><psrType>{psr}</psrType></MktPSRType>")
+                for psr, mw in PSR_MW.items()]),
+        }
+        imbalance = rng.normal(0, 250, n)
+        imb_price = level + 60 * np.tanh(imbalance / 200) + rng.normal(0, 15, n)
+        zips = {
+            ('A85', 'x', zone): _document('Balancing_MarketDocument', [
+                _series(start, imb_price - 10, 'imbalance_price.amount',
+                        extra_point=lambda i: "<imbalance_Price.category>A04</imbalance_Price.category>"),
+                _series(start, imb_price + 10, 'imbalance_price.amount',
+                        extra_point=lambda i: "<imbalance_Price.category>A05</imbalance_Price.category>")]),
+            ('A86', 'x', zone): _document('Balancing_MarketDocument', [_series(start, imbalance, 'quantity')]),
+        }
+        for key, xml in docs.items():
+            with open(os.path.join(root, '_'.join(key) + '.xml'), 'w') as f: f.write(xml)
+            written += 1
+        for key, xml in zips.items():
+            with zipfile.ZipFile(os.path.join(root, '_'.join(key) + '.zip'), 'w') as z: z.writestr('data.xml', xml)
+            written += 1
+    return written
+
+
+def record(api_key, root=FIXTURES_DIR, zones=None, days=7):
+    """Записує справжні відповіді ENTSO-E за останні `days` діб для всіх наборів даних."""
+    import upstream
+    from zones import COUNTRY_INFO
+    install(upstream._session, RecordingAdapter(root, pool_maxsize=upstream.MAX_CONCURRENCY))
+    end = pd.Timestamp.now(tz='Europe/Kyiv').floor('D')
+    start = end - pd.Timedelta(days=days)
+    for zone in zones or [i['zone'] for i in COUNTRY_INFO.values()]:
+        res = upstream.fan_out(api_key, zone, {ds: (ds, start, end) for ds in upstream.DATASETS}, return_exceptions=True)
+        print(zone, {ds: type(r).__name__ for ds, r in res.items()})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Фікстури для офлайн-заміни ENTSO-E")
+    parser.add_argument("command", choices=("record", "synth"))
+    parser.add_argument("--root", default=FIXTURES_DIR)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--zones", help="коди зон через кому (за замовчуванням — усі з COUNTRY_INFO)")
+    args = parser.parse_args()
+    zones = args.zones.split(",") if args.zones else None
+    if args.command == "synth":
+        print(f"{synthesize(args.root, zones, args.days)} фікстур записано в {args.root}")
+    else:
+        record(os.environ["entsoe_key"], args.root, zones, args.days)
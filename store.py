@@ -0,0 +1,343 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+import pandas as pd
+from entsoe.exceptions import NoMatchingDataError
+
+import metrics
+import upstream
+
+# --- ЛОКАЛЬНЕ СХОВИЩЕ ЧАСОВИХ РЯДІВ ---
+# Для кожної пари (зона, набір даних) тримаємо один Parquet-файл і копію в пам'яті.
+# При оновленні з ENTSO-E тягнемо лише те, чого ще немає: від останньої збереженої
+# мітки часу (мінус "хвіст", який ENTSO-E ще уточнює) до кінця потрібного вікна.
+
+DATA_DIR = os.environ.get("EC_GRID_DATA_DIR", ".data")
+TZ = 'Europe/Kyiv'
+RETENTION = timedelta(days=int(os.environ.get("EC_GRID_RETENTION_DAYS", "400")))
+
+# Скільки останніх даних перезавантажувати щоразу: РДН публікується один раз і не змінюється,
+# фактичні навантаження/генерація та небаланси ще уточнюються після публікації
+REVISION_TAIL = {
+    'prices': timedelta(0),
+    'load': timedelta(hours=2),
+    'imb_p': timedelta(hours=6),
+    'imb_v': timedelta(hours=6),
+    'gen': timedelta(hours=3),
+}
+
+log = logging.getLogger(__name__)
+
+# Мінімальна пауза перед повторною спробою дотягнути вікно, яке не вдалося завантажити (секунди)
+RETRY_AFTER = 60
+# Дані, старші за це (секунди), у відповідях позначаються як застарілі навіть без помилок
+STALE_AFTER = 2 * 3600
+
+# Вікно "живих" даних: дві доби назад (тренди, порівняння) і доба вперед (завтрашній РДН)
+LIVE_BACK = timedelta(hours=48)
+LIVE_AHEAD = timedelta(hours=24)
+
+UA_GEN_MAP = {
+    'Biomass': 'Біомаса', 'Fossil Brown coal/Lignite': 'Вугілля (Буре)',
+    'Fossil Gas': 'Газ', 'Fossil Hard coal': 'Вугілля (Кам.)',
+    'Hydro Pumped Storage': 'ГАЕС', 'Hydro Run-of-river and poundage': 'ГЕС (Прот)',
+    'Hydro Water Reservoir': 'ГЕС (Вод)', 'Nuclear': 'АЕС',
+    'Solar': 'Сонце', 'Wind Offshore': 'Вітер (Море)', 'Wind Onshore': 'Вітер (Суша)',
+    'Waste': 'Відходи', 'Other': 'Інше', 'Fossil Oil': 'Мазут', 'Geothermal': 'Геотерм.'
+}
+
+# Назва колонки, під якою pd.Series зберігається у Parquet
+_SERIES_COL = '__series__'
+
+
+def live_window(now):
+    return now - LIVE_BACK, now + LIVE_AHEAD
+
+
+def normalize(dataset, res):
+    """Приводить відповідь ENTSO-E до київського часу без дублікатів; генерацію — до UA_GEN_MAP."""
+    if res is None:
+        return None
+    with metrics.timed('normalize', dataset=dataset):
+        if res.index.tz is None: res.index = res.index.tz_localize('UTC').tz_convert(TZ)
+        else: res.index = res.index.tz_convert(TZ)
+        res = res[~res.index.duplicated(keep='last')]
+    if dataset == 'gen':
+        with metrics.timed('gen_groupby'):
+            if isinstance(res.columns, pd.MultiIndex): res.columns = res.columns.get_level_values(0)
+            res = res.T.groupby(level=0).sum().T.rename(columns=UA_GEN_MAP)
+    return res
+
+
+def atomic_write(path, write):
+    # Атомарний запис: інший процес (API/дашборд) ніколи не побачить напівзаписаний файл
+    tmp = f"{path}.{os.getpid()}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+class TimeSeriesStore:
+    """Сховище спільне для процесів API та дашборду: кожен тримає копію в пам'яті
+    і перечитує файл, коли його оновив інший процес (зміна mtime у .json)."""
+
+    def __init__(self, root=DATA_DIR):
+        self.root = root
+        self._frames = {}
+        self._meta = {}
+        self._mtimes = {}
+        self._meta_mtimes = {}
+        self._backfill_at = {}
+        self._invalid = set()
+        self._revalidating = set()
+        self._bg_lock = threading.Lock()
+        self._locks = defaultdict(threading.Lock)
+        # Слухачі оновлень: fn(зона, набір, увесь фрейм, доби з новими точками) — напр. rollups
+        self.listeners = []
+
+    def _path(self, zone, dataset, ext):
+        return os.path.join(self.root, 'live', zone, f"{dataset}.{ext}")
+
+    def _load_meta(self, zone, dataset):
+        # Лише метадані (версія, час оновлення, помилка) без читання Parquet: їх перевіряють
+        # на кожному запиті й у циклі push-потоку прямо в event loop
+        key = (zone, dataset)
+        try: mtime = os.stat(self._path(zone, dataset, 'json')).st_mtime_ns
+        except OSError: mtime = None
+        if key not in self._meta or (mtime is not None and self._meta_mtimes.get(key) != mtime):
+            meta = {}
+            try:
+                with open(self._path(zone, dataset, 'json')) as f: meta = json.load(f)
+            except (OSError, ValueError): pass
+            self._meta[key] = meta
+            self._meta_mtimes[key] = mtime
+        return self._meta[key]
+
+    def _load(self, zone, dataset):
+        key = (zone, dataset)
+        self._load_meta(zone, dataset)
+        mtime = self._meta_mtimes[key]
+        if key not in self._frames or (mtime is not None and self._mtimes.get(key) != mtime):
+            frame = None
+            try:
+                frame = pd.read_parquet(self._path(zone, dataset, 'parquet'))
+                if list(frame.columns) == [_SERIES_COL]: frame = frame[_SERIES_COL].rename(None)
+            except (OSError, ValueError): pass
+            self._frames[key] = frame
+            self._mtimes[key] = mtime
+        return self._frames[key]
+
+    def _save(self, zone, dataset, frame_changed):
+        key = (zone, dataset)
+        frame = self._frames[key]
+        os.makedirs(os.path.dirname(self._path(zone, dataset, 'json')), exist_ok=True)
+        if frame_changed and frame is not None:
+            out = frame.to_frame(_SERIES_COL) if isinstance(frame, pd.Series) else frame
+            atomic_write(self._path(zone, dataset, 'parquet'), out.to_parquet)
+        def write_meta(path):
+            with open(path, 'w') as f: json.dump(self._meta[key], f)
+        atomic_write(self._path(zone, dataset, 'json'), write_meta)
+        self._mtimes[key] = self._meta_mtimes[key] = os.stat(self._path(zone, dataset, 'json')).st_mtime_ns
+
+    def version(self, zone, dataset):
+        """Лічильник змін даних (зростає, коли оновлення принесло нові/змінені точки)."""
+        return self._load_meta(zone, dataset).get('version', 0)
+
+    def versions(self, zone, datasets=None):
+        return tuple(self.version(zone, ds) for ds in datasets or upstream.DATASETS)
+
+    def age(self, zone, dataset):
+        """Скільки секунд минуло від останнього вдалого оновлення з ENTSO-E (None — ще не було)."""
+        fetched_at = self._load_meta(zone, dataset).get('fetched_at')
+        return None if fetched_at is None else time.time() - fetched_at
+
+    def _since_attempt(self, zone, dataset):
+        # Від останньої спроби, вдалої чи ні: за ним обмежується частота запитів до ENTSO-E
+        meta = self._load_meta(zone, dataset)
+        attempted_at = meta.get('attempted_at', meta.get('fetched_at'))
+        return None if attempted_at is None else time.time() - attempted_at
+
+    def status(self, zone, datasets=None):
+        """Стан даних для відповідей: вік найстарішого набору та чи це запасні (застарілі) дані.
+
+        stale=True, якщо остання спроба оновлення не вдалася (видаються останні вдалі дані)
+        або дані старші за STALE_AFTER.
+        """
+        ages, stale, errors = [], False, {}
+        for ds in datasets or upstream.DATASETS:
+            age = self.age(zone, ds)
+            error = self._meta[(zone, ds)].get('error')
+            if error: errors[ds] = error
+            stale |= age is None or age > STALE_AFTER or bool(error)
+            if age is not None: ages.append(age)
+        return {'stale': stale, 'data_age_s': round(max(ages)) if ages else None, 'errors': errors}
+
+    def invalidate(self, zone, datasets=None):
+        """Позначає живі дані однієї зони застарілими; вони й далі видаються до наступного оновлення."""
+        self._invalid.update((zone, ds) for ds in datasets or upstream.DATASETS)
+
+    def refreshing(self, zone):
+        return zone in self._revalidating
+
+    def revalidate(self, api_key, zone, start, end, datasets=None, max_age=0, priority=upstream.USER):
+        """Запускає refresh у фоновому потоці (не більше одного на зону) і одразу повертається."""
+        with self._bg_lock:
+            if zone in self._revalidating:
+                return False
+            self._revalidating.add(zone)
+
+        def run():
+            try:
+                self.refresh(api_key, zone, start, end, datasets, max_age, priority=priority)
+            except Exception:
+                log.exception("background refresh of %s failed", zone)
+            finally:
+                with self._bg_lock:
+                    self._revalidating.discard(zone)
+        threading.Thread(target=run, name=f"revalidate-{zone}", daemon=True).start()
+        return True
+
+    def _covered_from(self, zone, dataset):
+        # З ISO-рядка виходить фіксований зсув UTC+03:00; entsoe-py вимагає однаковий tz у start/end
+        covered_from = self._meta[(zone, dataset)].get('covered_from')
+        return None if covered_from is None else pd.Timestamp(covered_from).tz_convert(TZ)
+
+    def covers(self, zone, dataset, start):
+        self._load_meta(zone, dataset)
+        covered_from = self._covered_from(zone, dataset)
+        return covered_from is not None and covered_from <= start
+
+    def read(self, zone, dataset, start=None, end=None):
+        frame = self._load(zone, dataset)
+        if frame is None:
+            return None
+        frame = frame.loc[start:end]
+        return None if frame.empty else frame
+
+    def _plan(self, zone, dataset, start, end):
+        # Вікна, які треба дотягнути з ENTSO-E: початок до covered_from та хвіст після останньої точки
+        frame = self._load(zone, dataset)
+        covered_from = self._covered_from(zone, dataset)
+        if frame is None or frame.empty or covered_from is None:
+            return [(start, end)]
+        windows = []
+        if start < covered_from:
+            windows.append((start, min(covered_from, end)))
+        # Хвіст — від останньої збереженої точки, навіть якщо запитане вікно починається пізніше:
+        # інакше після перерви в оновленнях лишилася б дірка, яку covered_from вважає покритою
+        fetch_start = max(frame.index[-1] - REVISION_TAIL[dataset], covered_from)
+        if fetch_start < end:
+            windows.append((fetch_start, end))
+        return windows
+
+    def _cover(self, zone, dataset, start):
+        covered_from = self._covered_from(zone, dataset)
+        if covered_from is None or start < covered_from:
+            self._meta[(zone, dataset)]['covered_from'] = start.isoformat()
+
+    def _merge(self, zone, dataset, new, start, now):
+        key = (zone, dataset)
+        old = self._frames[key]
+        meta = self._meta[key]
+        merged = new if old is None else pd.concat([old, new])
+        merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+        merged = merged.loc[now - RETENTION:]
+        changed = old is None or not merged.equals(old)
+        self._frames[key] = merged
+        self._cover(zone, dataset, max(start, now - RETENTION))
+        if changed:
+            meta['version'] = meta.get('version', 0) + 1
+        return changed
+
+    def refresh(self, api_key, zone, start, end, datasets=None, max_age=0, background=False, priority=upstream.USER):
+        """Дотягує з ENTSO-E лише відсутні дані й повертає {набір: дані у вікні [start, end]}.
+
+        Якщо до набору зверталися менше ніж max_age секунд тому (будь-який процес,
+        зазвичай фоновий планувальник), запит до ENTSO-E не робиться.
+        background=True (stale-while-revalidate): застарілі, але наявні дані віддаються одразу,
+        а оновлення йде у фоні; чекати доводиться лише коли запитане вікно ще не завантажувалось.
+        Якщо ENTSO-E недоступний, повертаються останні вдалі дані, а status() позначає їх як застарілі.
+        """
+        datasets = list(datasets or upstream.DATASETS)
+        now = pd.Timestamp.now(tz=TZ)
+
+        def stale():
+            # Застарілі набори, а також ті, де запитане вікно починається раніше за вже завантажене
+            # (після невдалої спроби дотягнути початок — не частіше ніж раз на RETRY_AFTER).
+            # Після помилки ENTSO-E повторюємо не раніше ніж через RETRY_AFTER, а не через max_age
+            stale = []
+            for ds in datasets:
+                since = self._since_attempt(zone, ds)
+                limit = min(max_age, RETRY_AFTER) if self._meta[(zone, ds)].get('error') else max_age
+                retry = time.monotonic() - self._backfill_at.get((zone, ds), float('-inf')) >= RETRY_AFTER
+                if (since is None or since >= limit or (zone, ds) in self._invalid
+                        or (not self.covers(zone, ds, start) and retry)):
+                    stale.append(ds)
+            return stale
+
+        # Свіжі дані віддаємо без блокування: читачі не чекають на оновлення іншої зони/процесу
+        outdated = stale()
+        if not outdated:
+            metrics.inc('ec_grid_cache_requests_total', cache='store', result='hit')
+            return {ds: self.read(zone, ds, start, end) for ds in datasets}
+        if background and all(self.age(zone, ds) is not None and self.covers(zone, ds, start) for ds in outdated):
+            metrics.inc('ec_grid_cache_requests_total', cache='store', result='stale')
+            self.revalidate(api_key, zone, start, end, datasets, max_age, priority)
+            return {ds: self.read(zone, ds, start, end) for ds in datasets}
+        metrics.inc('ec_grid_cache_requests_total', cache='store', result='miss')
+        with self._locks[zone]:
+            queries = {}
+            backfill = set()
+            for ds in stale():
+                if not self.covers(zone, ds, start):
+                    backfill.add(ds)
+                for i, window in enumerate(self._plan(zone, ds, start, end)):
+                    queries[(ds, i)] = (ds, *window)
+            if queries:
+                raw = upstream.fan_out(api_key, zone, queries, return_exceptions=True, priority=priority)
+                changed = dict.fromkeys({ds for ds, _ in queries}, False)
+                touched = defaultdict(set)
+                errors = {}
+                for (ds, i), res in raw.items():
+                    # "Немає даних" — теж успішна відповідь: вікно вважається покритим
+                    if isinstance(res, NoMatchingDataError):
+                        self._cover(zone, ds, queries[(ds, i)][1])
+                        continue
+                    try:
+                        if isinstance(res, Exception):
+                            raise res
+                        res = normalize(ds, res)
+                        if res is not None:
+                            changed[ds] |= self._merge(zone, ds, res, queries[(ds, i)][1], now)
+                            touched[ds].update(res.index.normalize().unique())
+                    except Exception as e:
+                        errors[ds] = f"{type(e).__name__}: {e}"[:200]
+                for ds, frame_changed in changed.items():
+                    meta = self._meta[(zone, ds)]
+                    meta['attempted_at'] = time.time()
+                    # Паузу RETRY_AFTER перед новою спробою дотягнути початок ставимо лише після невдачі
+                    if ds in backfill and ds in errors:
+                        self._backfill_at[(zone, ds)] = time.monotonic()
+                    else:
+                        self._backfill_at.pop((zone, ds), None)
+                    if ds in errors:
+                        meta['error'] = errors[ds]
+                        log.warning("refresh %s/%s failed, serving last good data: %s", zone, ds, errors[ds])
+                    else:
+                        meta['fetched_at'] = meta['attempted_at']
+                        meta.pop('error', None)
+                    self._save(zone, ds, frame_changed)
+                    self._invalid.discard((zone, ds))
+                    if frame_changed:
+                        for listener in self.listeners:
+                            try: listener(zone, ds, self._frames[(zone, ds)], sorted(touched[ds]))
+                            except Exception: log.exception("store listener failed for %s/%s", zone, ds)
+            return {ds: self.read(zone, ds, start, end) for ds in datasets}
+
+
+# Спільний екземпляр для API та дашборду
+store = TimeSeriesStore()
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+import analytics
+import charts
+
+# Регресія: уночі, до першого опублікованого інтервалу доби, зрізи "сьогодні" порожні —
+# KPI та графіки мають показувати нулі/прочерки, а не падати на reshape порожнього масиву
+
+
+def _frames(now):
+    index = pd.date_range(now.normalize() - pd.Timedelta(days=1), now.normalize() - pd.Timedelta(minutes=15),
+                          freq='15min', tz=now.tz)
+    rng = np.random.default_rng(0)
+    return {
+        'prices': pd.Series(rng.uniform(50, 150, len(index)), index=index),
+        'imb_p': pd.DataFrame(rng.uniform(0, 200, (len(index), 2)), index=index, columns=['Long', 'Short']),
+        'imb_v': pd.Series(rng.uniform(-500, 500, len(index)), index=index),
+    }
+
+
+def test_empty_today_slices():
+    now = pd.Timestamp('2026-10-17 00:05', tz='Europe/Kyiv')
+    live = _frames(now)
+    today = {k: v.loc[now.normalize():] for k, v in live.items()}
+    assert all(v.empty for v in today.values())
+
+    kpis = analytics.period_kpis(today)
+    assert kpis['price'] is None
+    assert kpis['imbalance'] == {'price_max': 0.0, 'price_min': 0.0, 'price_avg': 0.0,
+                                 'surplus_max_mw': 0.0, 'deficit_max_mw': 0.0}
+    assert analytics.live_kpis(live, now)['imb_spread'] is None
+    assert analytics.live_kpis(today, now)['spot'] is None
+
+    spec = charts.imbalance(live['imb_p'], live['imb_v'], now + pd.Timedelta(hours=1), now + pd.Timedelta(hours=2))
+    assert [d['type'] for d in spec['data']] == ['scatter', 'scatter', 'bar']
+    assert charts.generation(pd.DataFrame(index=live['prices'].index[:0]))['data'] == []
@@ -0,0 +1,121 @@
+import contextvars
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import parse_qs, urlsplit
+from entsoe import EntsoePandasClient
+from entsoe.exceptions import NoMatchingDataError
+
+import metrics
+import standin
+from governor import Governor, USER, LIVE, HISTORY
+
+# --- СПІЛЬНИЙ КЛІЄНТ ENTSO-E (для main.py та dashboard.py) ---
+# entsoe-py працює синхронно, тому запити виконуються в окремому пулі потоків.
+# Розмір пулу = максимальна кількість одночасних запитів до ENTSO-E. FastAPI звертається сюди
+# лише через сховище (store.refresh у asyncio.to_thread), тож event loop не блокується.
+# Чергу, квоту та circuit breaker веде governor.Governor; priority задає порядок у черзі
+# (USER — запити користувачів, LIVE — живі дані планувальника, HISTORY — історичні доби).
+
+MAX_CONCURRENCY = int(os.environ.get("ENTSOE_MAX_CONCURRENCY", "8"))
+REQUEST_TIMEOUT = int(os.environ.get("ENTSOE_TIMEOUT", "30"))
+# Скільки чекати на кожен запит у fan_out (від моменту постановки в пул)
+QUERY_TIMEOUT = float(os.environ.get("ENTSOE_QUERY_TIMEOUT", "45"))
+
+# Назва набору даних -> метод EntsoePandasClient
+DATASETS = {
+    'prices': 'query_day_ahead_prices',
+    'load': 'query_load',
+    'imb_p': 'query_imbalance_prices',
+    'imb_v': 'query_imbalance_volumes',
+    'gen': 'query_generation',
+}
+
+_governor = Governor(MAX_CONCURRENCY)
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENCY))
+_session.hooks['response'].append(lambda r, *args, **kwargs: metrics.observe(
+    'ec_grid_entsoe_http_seconds', r.elapsed.total_seconds(), status=r.status_code,
+    document_type=parse_qs(urlsplit(r.request.url).query).get('documentType', ['?'])[0]))
+# Офлайн-заміна ENTSO-E записаними відповідями (ENTSOE_STANDIN) або запис фікстур (ENTSOE_RECORD)
+standin.from_env(_session)
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key):
+    """Один довгоживучий клієнт на ключ, усі — поверх спільної сесії з пулом з'єднань."""
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = EntsoePandasClient(api_key=api_key, session=_session, timeout=REQUEST_TIMEOUT)
+            _clients[api_key] = client
+        return client
+
+
+def submit(api_key, dataset, country, start, end, priority=USER):
+    """Ставить запит у чергу губернатора і повертає concurrent.futures.Future."""
+    method = getattr(get_client(api_key), DATASETS[dataset])
+    # Контекст викликача (trace HTTP-запиту) переходить у потік губернатора
+    context = contextvars.copy_context()
+
+    def call():
+        metrics.add('ec_grid_upstream_inflight', 1)
+        outcome = 'error'
+        try:
+            with metrics.timed('upstream', dataset=dataset, zone=country):
+                result = method(country, start=start, end=end)
+            outcome = 'ok'
+            return result
+        except NoMatchingDataError:
+            outcome = 'no_data'
+            raise
+        finally:
+            metrics.add('ec_grid_upstream_inflight', -1)
+            metrics.inc('ec_grid_upstream_requests_total', dataset=dataset, outcome=outcome)
+    return _governor.submit(lambda: context.run(call), priority)
+
+
+def query(api_key, dataset, country, start, end, priority=USER):
+    """Синхронний запит (для Streamlit) з тим самим обмеженням паралельності."""
+    return submit(api_key, dataset, country, start, end, priority).result()
+
+
+def fan_out(api_key, country, queries, timeout=QUERY_TIMEOUT, return_exceptions=False, priority=USER):
+    """Запускає кілька запитів паралельно.
+
+    queries: {мітка: (набір даних, start, end)}. Повертає {мітка: результат або None} —
+    кожен запит падає окремо (помилка, перевищення timeout чи відкритий circuit breaker
+    дає None, а з return_exceptions=True — сам об'єкт винятку).
+    """
+    futures = {label: submit(api_key, ds, country, s, e, priority) for label, (ds, s, e) in queries.items()}
+    deadline = time.monotonic() + timeout
+    results = {}
+    for label, fut in futures.items():
+        try:
+            results[label] = fut.result(timeout=max(deadline - time.monotonic(), 0))
+        except Exception as e:
+            fut.cancel()
+            results[label] = e if return_exceptions else None
+    return results
+
+
+def retry_in():
+    """Скільки секунд ще відкритий circuit breaker (0 — запити до ENTSO-E йдуть)."""
+    return _governor.breaker.retry_in()
+
+
+def stats():
+    return _governor.stats()
+
+
+@metrics.collector
+def _governor_metrics():
+    s = _governor.stats()
+    return ([('gauge', 'ec_grid_upstream_queued', {'priority': p}, n) for p, n in s['queued'].items()]
+            + [('gauge', 'ec_grid_upstream_tokens', {}, s['tokens']),
+               ('gauge', 'ec_grid_upstream_circuit_open', {}, int(s['state'] != 'closed')),
+               ('counter', 'ec_grid_upstream_rejected_total', {}, s['rejected'])])
@@ -0,0 +1,15 @@
+# --- ДОВІДНИК ЗОН (спільний для дашборду, API та фонового планувальника) ---
+COUNTRY_INFO = {
+    "PL": {"name": "Польща", "tso": "PSE S.A.", "anom": "Вугільна інерція.", "cause": "80% вугілля.", "zone": "PL"},
+    "UA": {"name": "Україна", "tso": "Укренерго", "anom": "Дефіцит, обстріли.", "cause": "Війна.", "zone": "UA_IPS"},
+    "DE_LU": {"name": "Німеччина", "tso": "TenneT/Amprion", "anom": "Від'ємні ціни.", "cause": "Надлишок вітру.", "zone": "DE_LU"},
+    "FR": {"name": "Франція", "tso": "RTE", "anom": "Чутливість до холоду.", "cause": "Атомна енергетика.", "zone": "FR"},
+    "HU": {"name": "Угорщина", "tso": "MAVIR", "anom": "Дорогий імпорт.", "cause": "Дефіцит генерації.", "zone": "HU"},
+    "SK": {"name": "Словаччина", "tso": "SEPS", "anom": "Транзит.", "cause": "Інтеграція CZ-HU.", "zone": "SK"},
+    "RO": {"name": "Румунія", "tso": "Transelectrica", "anom": "Посухи.", "cause": "Гідрозалежність.", "zone": "RO"},
+    "CZ": {"name": "Чехія", "tso": "ČEPS", "anom": "Експорт.", "cause": "АЕС.", "zone": "CZ"},
+    "MD": {"name": "Молдова", "tso": "Moldelectrica", "anom": "Дефіцит.", "cause": "Немає генерації.", "zone": "MD"}
+}
+
+# Зони, які обслуговують API і планувальник (інші коди не доходять до сховища й ENTSO-E)
+ZONES = frozenset(i['zone'] for i in COUNTRY_INFO.values())